@@ -1,6 +1,8 @@
 from .renderer import (
         render,
         preprocess,
+        render_async,
+        preprocess_async,
         )
 from .evaluator import (
         raw,
@@ -8,6 +10,8 @@ from .evaluator import (
         block,
         pyargs,
         glom,
+        writes,
+        memoize,
         SuppressPageGenerationException,
         )
 from .context import (
@@ -8,7 +8,9 @@ import shutil
 from pathlib import Path
 
 import appeldryck
+from . import context
 from . import evaluator
+from . import output
 from . import renderer
 
 
@@ -45,6 +47,9 @@ def build():
     if hasattr(ctx, 'post'):
         ctx.post()
 
+    for (name, hits, misses, rate) in evaluator.memo_cache.hit_rates():
+        print(f'memoized {name}: {hits} hits, {misses} misses, {rate:.0%} hit rate')
+
 
 def process_dir(path: Path, ctx):
     items = sorted(list(path.iterdir()))
@@ -59,6 +64,7 @@ def process_dir(path: Path, ctx):
                 mod = load_module_from_file(str(item))
                 # TODO: Is there a cleaner way to do this?
                 ctx.__dict__.update(mod.__dict__)
+                context.changed()
 
     # Any .dryck file starting with _ is a function definition rather than a target.
     # Read them all into the top of the context stack.
@@ -124,15 +130,22 @@ def copy(src):
 
 def process(src, ctx):
     # We need to process the markup first, in order to get the template name.
-    ctx.body = indented_string(renderer.markup(ctx, src))
+    body = renderer.markup(ctx, src)
+    if body is None:
+        # The page suppressed itself.
+        return
+    ctx.body = indented_string(body)
     dest = Path(DEST) / src.relative_to(SRC).with_suffix(Path(ctx.template).suffix)
     # TODO: Approximately nothing about the next line is good.
     # HAHAHA ctx.template needs to be looked up as a function
     template_fn = getattr(ctx, ctx.template)
-    body = evaluator.apply_func(template_fn, [], ctx, raw=True, indent=0)
     print(f'drycking {src} as {dest}')
-    with open(dest, 'w') as out:
-        out.write(body)
+    with output.File(dest) as out:
+        try:
+            evaluator.write_func(out.write, template_fn, [], ctx, raw=True, indent=0)
+        except evaluator.SuppressPageGenerationException:
+            # So did the template. Leave dest as it was.
+            out.discard()
 
 
 def indented_string(text):
@@ -148,9 +161,10 @@ def indented_string(text):
 def preprocess(src, ctx):
     dest = Path(DEST) / src.relative_to(SRC).with_suffix('')
     print(f'drycking {src} as {dest}')
-    body = appeldryck.preprocess(ctx, src)
-    with open(dest, 'w') as out:
-        out.write(body)
+    # Write the output as it is made, rather than holding all of it.
+    with output.File(dest) as out:
+        if appeldryck.preprocess(ctx, src, out) is None:
+            out.discard()
 
 
 def add_file_to_context(src, ctx, raw):
@@ -159,12 +173,17 @@ def add_file_to_context(src, ctx, raw):
 
 
 def curry_file_as_function(src, raw):
+    # The file is written, as it is rendered, to the markup that calls it.
     @appeldryck.indented
     @appeldryck.glom
-    def run_template(self):
+    @appeldryck.writes
+    def run_template(self, write):
         if raw:
-            return appeldryck.preprocess(self, src)
+            out = appeldryck.preprocess(self, src, output.Writer(write))
         else:
-            return appeldryck.render(self, src)
+            out = appeldryck.render(self, src, out=output.Writer(write))
+        if out is None:
+            # The file suppressed itself, and with it what it was rendered for.
+            raise evaluator.SuppressPageGenerationException()
 
     return run_template
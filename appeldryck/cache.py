@@ -0,0 +1,242 @@
+import collections
+import functools
+import hashlib
+import os
+import pickle
+import threading
+from pathlib import Path
+
+from .parser import ast
+
+
+def cache_dir(*parts):
+    '''Returns the directory (not necessarily existing yet) where dryck keeps
+    the named cache. This lives outside the project tree, under $DRYCK_CACHE_DIR
+    if set and otherwise under the XDG user cache directory.'''
+    root = os.environ.get('DRYCK_CACHE_DIR')
+    if not root:
+        xdg = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+        root = Path(xdg) / 'appeldryck'
+    return Path(root).joinpath(*parts)
+
+
+class LRUCache:
+    '''A bounded, thread-safe mapping that evicts the least recently used
+    entry when full, and counts its hits and misses.
+
+    If weigh is given, the cache is also full once the weights that it
+    gives the entries, as weigh(key, value), add up to more than maxweight.'''
+
+    def __init__(self, maxsize=256, maxweight=None, weigh=None):
+        self.maxsize = maxsize
+        self.maxweight = maxweight
+        self.weigh = weigh
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._weights = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        '''Returns the cached value for key, or None.'''
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if self.weigh is not None:
+                weight = self.weigh(key, value)
+                self.weight += weight - self._weights.get(key, 0)
+                self._weights[key] = weight
+            while (len(self._entries) > self.maxsize
+                   or self.weigh is not None and self.weight > self.maxweight):
+                self._drop(next(iter(self._entries)))
+
+    def pop(self, key):
+        '''Drop the entry for key, if there is one.'''
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def _drop(self, key):
+        del self._entries[key]
+        self.weight -= self._weights.pop(key, 0)
+
+    def clear(self):
+        '''Drop every entry and reset the counters.'''
+        with self._lock:
+            self._entries.clear()
+            self._weights.clear()
+            self.weight = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return (f'{type(self).__name__}(hits={self.hits}, misses={self.misses}, '
+                f'size={len(self)}, maxsize={self.maxsize})')
+
+
+class MemoCache(LRUCache):
+    '''An LRUCache of the results of functions, which also counts
+    the hits and misses of each function on its own.'''
+
+    def __init__(self, maxsize=4096):
+        super().__init__(maxsize)
+        self.functions = {}
+
+    def lookup(self, name, key):
+        '''Returns the cached value for key, or None, counting it for the named function.'''
+        value = self.get(key)
+        with self._lock:
+            counts = self.functions.get(name)
+            if counts is None:
+                counts = self.functions[name] = [0, 0]
+            counts[0 if value is not None else 1] += 1
+        return value
+
+    def hit_rates(self):
+        '''Returns (name, hits, misses, hit rate) for each function, most called first.'''
+        with self._lock:
+            rates = [(name, hits, misses, hits / (hits + misses))
+                     for (name, (hits, misses)) in self.functions.items()]
+        return sorted(rates, key=lambda rate: rate[1] + rate[2], reverse=True)
+
+    def clear(self):
+        super().clear()
+        with self._lock:
+            self.functions.clear()
+
+
+class DocumentCache:
+    '''Parsed documents, pickled to a directory so that they outlive the
+    process. Entries are keyed by a hash of the source text, the parser mode
+    and the grammar version, so they never need invalidating: a changed file
+    or parser simply misses.
+
+    Instead, once the directory holds more than maxbytes, the documents
+    least recently used, going by their modification times, are deleted
+    until it is down to three quarters of that.'''
+
+    def __init__(self, directory, maxbytes=256 << 20):
+        self.directory = Path(directory)
+        self.maxbytes = maxbytes
+        # How big the directory is, as of the last prune, and what has
+        # been written since, or None until we first write to it.
+        self.size = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, text, raw):
+        '''Returns the cached document for text, or None.'''
+        path = self._path(text, raw)
+        try:
+            with open(path, 'rb') as f:
+                doc = _SourceUnpickler(f, ast.Source(text)).load()
+            # Mark the document as used, so that it is the last to be pruned.
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return doc
+
+    def put(self, text, raw, doc):
+        path = self._path(text, raw)
+        # Write to a temporary file and move it into place, so that concurrent
+        # builds never observe a partially written document.
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                _SourcePickler(f, doc.source).dump(doc)
+                written = f.tell()
+            os.replace(tmp, path)
+        except OSError:
+            # The cache is only an optimization.
+            tmp.unlink(missing_ok=True)
+            return
+        with self._lock:
+            if self.size is None:
+                # Other processes may have filled it, so look before trusting a count.
+                self.prune()
+            else:
+                self.size += written
+                if self.size > self.maxbytes:
+                    self.prune()
+
+    def prune(self):
+        '''Delete the least recently used documents, if there are too many.'''
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith('.pickle'):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        self.size = sum(size for (_, size, _) in entries)
+        if self.size <= self.maxbytes:
+            return
+        entries.sort()
+        for (_, size, path) in entries:
+            if self.size <= self.maxbytes * 3 // 4:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                # Somebody else got there first.
+                pass
+            self.size -= size
+
+    def _path(self, text, raw):
+        key = hashlib.sha256(f'{grammar_version()}:{raw}:'.encode())
+        key.update(text.encode('utf-8', 'surrogatepass'))
+        return self.directory / f'{key.hexdigest()}.pickle'
+
+
+# The source text is by far the biggest thing a document refers to, and the
+# reader of a cached document already has it, so it is left out of the pickle.
+
+class _SourcePickler(pickle.Pickler):
+    def __init__(self, file, source):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.source = source
+
+    def persistent_id(self, obj):
+        return 'source' if obj is self.source else None
+
+
+class _SourceUnpickler(pickle.Unpickler):
+    def __init__(self, file, source):
+        super().__init__(file)
+        self.source = source
+
+    def persistent_load(self, pid):
+        return self.source
+
+
+@functools.cache
+def grammar_version():
+    '''A hash of the parser’s own source, which determines what it makes of a document.'''
+    digest = hashlib.sha256()
+    parser = Path(__file__).parent / 'parser'
+    for path in sorted(parser.rglob('*.py')):
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
@@ -0,0 +1,294 @@
+'''Compiling documents into Python.
+
+Templates, partials and the bodies of ◊if and ◊loop are evaluated over and
+over, and eval_blocks walks the whole tree of a document every time: it
+matches every node against each kind in turn, reads the decorators of every
+function it calls, and builds up the markup a node at a time. A document
+that has been evaluated a few times is compiled instead, into a Python
+function that renders it with straight-line code. Runs of text are string
+constants, and each call remembers the function it found last, with its
+decorators, for as long as no context changes.
+
+The function does just what eval_blocks would, in the same order, down to
+which node is current when something goes wrong, so that errors are
+reported at the same line and column.'''
+
+from functools import partial
+
+from . import context
+from . import evaluator
+from . import output
+from .parser import ast
+
+
+# How many times a document is interpreted before it is compiled. Compiling
+# takes about as long as interpreting a dozen times, and pays off only for
+# documents rendered many times more than that, while most are rendered once.
+THRESHOLD = 10
+
+# The longest document, in characters of source, that is ever compiled.
+# Compiling takes about 5 ms and, at its peak, 1.5 KB of memory a character,
+# so a big page would take seconds and gigabytes, and it would gain little:
+# the time goes into its calls more than into walking its tree.
+MAX_LENGTH = 16 * 1024
+
+
+def compiled(doc):
+    '''The render function of doc, or None if doc isn’t worth compiling,
+    or isn’t yet.'''
+    render = doc.compiled
+    if type(render) is int:
+        if render < THRESHOLD or doc.end - doc.start > MAX_LENGTH:
+            doc.compiled = render + 1
+            return None
+        render = doc.compiled = compile_doc(doc)
+    return render
+
+
+def compile_doc(doc):
+    '''Compile the blocks of doc into a function render(env, raw, tight,
+    current_token, write), which writes the same markup as eval_blocks.'''
+    c = Compiler()
+    c.blocks(doc.text)
+    code = compile('\n'.join(c.lines), '<dryck>', 'exec')
+    namespace = c.names
+    exec(code, namespace)
+    return namespace['render']
+
+
+class CallSite:
+    '''Where a document calls a function, or uses a variable, by name.
+    The code for the call checks the cache first: the context the name was
+    last looked up on, the context.version it was looked up at, the function
+    it found, and the decorator props of that. A variable isn’t cached, but
+    looked up every time, since its value may come from a property or a
+    __getattr__, which no version tells us the changes of.'''
+
+    __slots__ = ('name', 'cache')
+
+    def __init__(self, name):
+        self.name = name
+        self.cache = (None, None, None, None)
+
+    def resolve(self, env):
+        '''Look the name up on env, returning what it is and its props,
+        or None if it isn’t callable.'''
+        # As of before the lookup, lest a change come in the middle of it.
+        version = context.version
+        fn = getattr(env, self.name)
+        if not callable(fn):
+            return (fn, None)
+        props = evaluator.get_func_props(fn)
+        # Only a Context tells us when it changes.
+        if isinstance(env, context.Context):
+            self.cache = (env, version, fn, props)
+        return (fn, props)
+
+
+class Compiler:
+    '''Writes the source of a render function, line by line.'''
+
+    def __init__(self):
+        self.lines = ['def render(env, raw, tight, current_token, write):']
+        self.depth = 1
+        # The globals of the function: the evaluator’s helpers,
+        # and the nodes, arguments and code it refers to.
+        self.names = {
+            'write_func': evaluator.write_func,
+            'consume': evaluator.consume,
+            'line_end': evaluator.line_end,
+            'partial': partial,
+            'eval_expr': evaluator.eval_expr,
+            'Line': output.Line,
+            'Stream': output.Stream,
+            'DryckException': evaluator.DryckException,
+            'context': context,
+        }
+        # The node that eval_blocks would have made current by now,
+        # and the one that the code has last made current.
+        self.current = None
+        self.told = None
+        # How deep we are in emphasis.
+        self.level = 0
+
+    def emit(self, line):
+        self.lines.append('    ' * self.depth + line)
+
+    def name(self, prefix, value):
+        '''A global name for value.'''
+        name = f'{prefix}{len(self.names)}'
+        self.names[name] = value
+        return name
+
+    def resolve(self, name):
+        '''Emit the code to set fn and props to what name is on env.'''
+        site = self.name('site', CallSite(name))
+        self.emit(f'(cached, version, fn, props) = {site}.cache')
+        self.emit('if cached is not env or version is not context.version:')
+        self.emit(f'    (fn, props) = {site}.resolve(env)')
+
+    def sync(self):
+        '''Make the current node current at run time too,
+        before doing something that might go wrong.'''
+        if self.current is not self.told:
+            self.emit(f'current_token[0] = {self.name("node", self.current)}')
+            self.told = self.current
+
+    def add(self, write, expr, checked=False):
+        '''Emit the code to pass the markup expr makes to write.'''
+        # Markup is collected in lists and joined, since adding strings
+        # is only fast when the same code does it over and over.
+        if checked:
+            self.emit(f'{write}({expr})')
+        else:
+            # Fail as adding it to a string would, if it isn’t one.
+            self.emit(f'markup = {expr}')
+            self.emit(f"{write}(markup if markup.__class__ is str else '' + markup)")
+
+    def blocks(self, blocks):
+        for p in blocks:
+            self.current = p
+            kind = type(p)
+            if kind is ast.Raw:
+                self.sync()
+                self.emit("assert raw, 'Raw AST node in non-raw context; probably a parser bug'")
+                text = self.elements(p.text, stream=True)
+                if text is not None:
+                    self.add('write', text, checked=True)
+            elif kind is ast.Paragraph:
+                glom = len(p.text) == 1 and type(p.text[0]) is ast.Apply
+                text = self.elements(p.text, glom)
+                self.sync()
+                if glom:
+                    self.add('write', f'{text} if tight or glom else consume(env.p, {text})', checked=True)
+                    self.emit(f"if glom and not {text}.endswith('\\n'):")
+                    self.emit(f'    write(consume(line_end, {text}))')
+                else:
+                    self.add('write', f'{text} if tight else consume(env.p, {text})', checked=True)
+            elif kind is ast.Itemized:
+                self.emit('items = []')
+                for item in p.items:
+                    text = self.elements(item.text)
+                    self.sync()
+                    self.add('items.append', f'consume(env.li, {text})', checked=True)
+                self.sync()
+                self.add('write', "consume(env.ul, ''.join(items))", checked=True)
+            elif kind is ast.Heading:
+                text = self.elements(p.text)
+                self.sync()
+                self.add('write', f'consume(partial(env.heading, {p.level!r}), {text})', checked=True)
+            else:
+                self.sync()
+                self.emit(f"raise Exception('Bad block: ' + str({self.name('node', p)}))")
+
+    def elements(self, elements, glom=False, stream=False):
+        '''Emit the code for what eval_text does with elements, and return
+        an expression for their markup: a constant, if they are all text.
+        If stream is true, the markup is written to a Stream as it comes,
+        unless it is a constant, and None is returned.'''
+        parts = f'parts{self.level}'
+        # Text waiting to be added, and whether parts has been made yet.
+        pending = ''
+        started = False
+        # The last line of the markup so far, if it is all text,
+        # which is all get_indent needs to know. If it isn’t,
+        # whether a Line has been made to follow it at run time.
+        tail = ''
+        line = f'line{self.level}'
+        following = False
+        if glom:
+            self.emit('glom = False')
+
+        for t in elements:
+            self.current = t
+            kind = type(t)
+            if kind is ast.Text:
+                pending += t.text
+                newline = t.text.rfind('\n')
+                if newline >= 0:
+                    tail = t.text[newline + 1:]
+                elif tail is not None:
+                    tail += t.text
+                continue
+            if kind is ast.Soft:
+                continue
+
+            if not started:
+                if stream:
+                    self.emit(f'{parts} = Stream(write)')
+                    if pending:
+                        self.emit(f'{parts}.append({pending!r})')
+                else:
+                    self.emit(f'{parts} = [{pending!r}]' if pending else f'{parts} = []')
+                started = True
+            elif pending:
+                self.emit(f'{parts}.append({pending!r})')
+            pending = ''
+            if tail is not None:
+                indent = repr(evaluator.get_indent(tail))
+            else:
+                if not following:
+                    self.emit(f'{line} = Line()')
+                    following = True
+                indent = f'{line}.indent({parts})'
+            tail = None
+            self.sync()
+
+            if kind is ast.Eval:
+                expr = t.expr.rstrip()
+                try:
+                    code = evaluator.compile_expr(expr)
+                except (SyntaxError, ValueError):
+                    # Leave it to eval to fail in the same way, when its turn comes.
+                    code = expr
+                self.add(f'{parts}.append', f'eval_expr({self.name("code", code)}, env)', checked=True)
+
+            elif kind is ast.Apply:
+                self.resolve(t.func)
+                args = self.name('args', t.args)
+                self.emit('if props is not None:')
+                self.depth += 1
+                if glom:
+                    self.emit('if props.glom:')
+                    self.emit('    glom = True')
+                self.emit(f'write_func({parts}.append, fn, {args}, env, raw, {indent}, props)')
+                self.depth -= 1
+                self.emit('else:')
+                self.depth += 1
+                if t.args:
+                    self.emit("raise DryckException('Tried to pass args to a non-callable')")
+                else:
+                    # A variable.
+                    self.add(f'{parts}.append', 'fn')
+                self.depth -= 1
+
+            elif kind is ast.Link:
+                self.resolve('wiki_link')
+                args = self.name('args', (t.dest, t.label))
+                self.emit(f'write_func({parts}.append, fn, {args}, env, raw, {indent}, props)')
+
+            elif kind is ast.Star:
+                em = f'em{self.level}'
+                self.emit(f'{em} = env.em')
+                self.level += 1
+                text = self.elements(t.text)
+                self.level -= 1
+                self.sync()
+                self.add(f'{parts}.append', f'consume({em}, {text})', checked=True)
+
+            elif kind is ast.Break:
+                self.add(f'{parts}.append', 'env.br()')
+
+            else:
+                self.emit(f"raise Exception('Bad element: ' + str({self.name('node', t)}))")
+
+        if not started:
+            return repr(pending)
+        if pending:
+            self.emit(f'{parts}.append({pending!r})')
+        if stream:
+            return None
+        text = f'text{self.level}'
+        self.emit(f"{text} = ''.join({parts})")
+        return text
+
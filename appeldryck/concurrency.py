@@ -0,0 +1,168 @@
+'''Async dryck functions, run concurrently.
+
+A document is evaluated from start to end without stopping, so when it calls
+an async function, the coroutine is set aside, and a placeholder is written
+in place of its markup. Rendering for an async entry point, under gather,
+the coroutines are then run together on the event loop, and their markup
+is stitched into the placeholders, in document order. Anywhere else, each
+is run to completion as it is called, which can't be done from a coroutine,
+so code that is async itself should render with the async entry points.
+An @writes function can't be async.
+
+What makes something of the markup of an async call, such as a function it
+is an argument of, or env.p of its paragraph, is set aside in the same way,
+and called once that markup is ready, in place of its own placeholder.
+It is called on the attributes that the context had when it was set aside,
+such as the item of a ◊loop, and if it fails, it says where it was made.
+An async function itself runs once the page has been evaluated, though,
+and so should take what it needs from its arguments, not from the context.
+A function that evaluates markup itself, with eval_page, say, still gets
+placeholders in what comes back, and should leave them be.
+
+A placeholder has a newline in it. The indentation that @indented calls
+around it give that newline is then what to give the newlines of its markup.'''
+
+import contextvars
+import inspect
+import re
+
+# The Calls of the rendering being gathered, if there is one.
+current = contextvars.ContextVar('calls', default=None)
+
+# Starts every placeholder, and so marks markup that has one.
+MARK = '\x00'
+PLACEHOLDER_RE = re.compile('\x00([0-9]+)\n( *)\x01')
+
+
+def call(coroutine, indented, report=None):
+    '''The markup of an async call, or a placeholder for it. If it fails
+    later, report makes of the exception the one to raise instead.'''
+    calls = current.get()
+    if calls is None:
+        # Not imported until it is needed, since it takes longer to import
+        # than all the rest of appeldryck, and most sites have no async calls.
+        import asyncio
+        # The calls that it makes in turn are gathered, not run one by one.
+        return asyncio.run(gather(wait, coroutine))
+    return calls.add(coroutine, indented, report)
+
+
+def later(fn, args, indented=False):
+    '''A placeholder for fn(*args), called once the markup among args,
+    which is waiting on async calls, is ready.'''
+    calls = current.get()
+    if calls is None:
+        # Not a placeholder after all, but text that happens to look like one.
+        return fn(*args)
+    return calls.add(calls.apply(fn, args), indented)
+
+
+def check(coroutine, markup):
+    if not isinstance(markup, str):
+        raise Exception(f'Expected {coroutine.__qualname__} to return str, but got {markup}')
+    return markup
+
+
+async def wait(coroutine):
+    return check(coroutine, await coroutine)
+
+
+class Calls:
+    '''The async calls made by a rendering, and their markup once they are done.'''
+
+    def __init__(self):
+        self.tasks = []
+        # The coroutines that tasks run within another, and so can’t close.
+        self.wrapped = []
+        self.indented = []
+        # The documents being evaluated, innermost last, as the evaluator
+        # keeps them, to say where a call was made if it fails later.
+        self.where = []
+        # How many of the tasks have been waited for.
+        self.waited = 0
+
+    def add(self, coroutine, indented, report=None):
+        '''Start a call, and return its placeholder.'''
+        import asyncio
+        n = len(self.tasks)
+        if report is not None:
+            self.wrapped.append(coroutine)
+            coroutine = self.finish(coroutine, report)
+        # It gets going once the rendering lets the event loop run.
+        self.tasks.append(asyncio.ensure_future(coroutine))
+        self.indented.append(indented)
+        return f'{MARK}{n}\n\x01'
+
+    async def finish(self, coroutine, report):
+        try:
+            return check(coroutine, await coroutine)
+        except Exception as e:
+            raise report(e)
+
+    def markup(self, n):
+        '''The markup of a call that is done.'''
+        task = self.tasks[n]
+        return check(task.get_coro(), task.result())
+
+    async def apply(self, fn, args):
+        '''fn(*args), once the calls that the markup among args waits on are done.'''
+        for arg in args:
+            if arg.__class__ is str:
+                await self.ready(arg)
+        return fn(*[self.stitch(arg) if arg.__class__ is str else arg for arg in args])
+
+    async def ready(self, markup):
+        '''Wait for the calls whose placeholders are in markup, and in theirs.'''
+        for match in PLACEHOLDER_RE.finditer(markup):
+            n = int(match[1])
+            await self.tasks[n]
+            await self.ready(self.markup(n))
+
+    async def run(self):
+        '''Wait for the calls, and any that they make in turn.'''
+        import asyncio
+        while self.waited < len(self.tasks):
+            batch = self.tasks[self.waited:]
+            self.waited = len(self.tasks)
+            await asyncio.gather(*batch)
+
+    def cancel(self):
+        '''Cancel the calls still going, which failed rendering leaves behind,
+        and close those that never got going.'''
+        for task in self.tasks:
+            task.cancel()
+        for coroutine in self.wrapped:
+            if inspect.getcoroutinestate(coroutine) == inspect.CORO_CREATED:
+                coroutine.close()
+
+    def stitch(self, markup):
+        '''Markup, with the markup of each call in place of its placeholder.'''
+        def replace(match):
+            n = int(match[1])
+            text = self.markup(n)
+            # An @indented call’s last newline is dropped, as if it had been written.
+            if self.indented[n] and text.endswith('\n'):
+                text = text[:-1]
+            text = self.stitch(text)
+            pad = match[2]
+            return text.replace('\n', '\n' + pad) if pad else text
+        if MARK not in markup:
+            return markup
+        return PLACEHOLDER_RE.sub(replace, markup)
+
+
+async def gather(render, *args, **kwargs):
+    '''Call render, which returns markup, or None, or is async, running the async
+    calls it makes concurrently, and return its markup with theirs stitched in.'''
+    calls = Calls()
+    token = current.set(calls)
+    try:
+        markup = render(*args, **kwargs)
+        if inspect.iscoroutine(markup):
+            markup = await markup
+        # The calls inherit current, so the calls that they make are ours too.
+        await calls.run()
+    finally:
+        current.reset(token)
+        calls.cancel()
+    return None if markup is None else calls.stitch(markup)
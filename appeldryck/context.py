@@ -4,7 +4,28 @@ import os
 from . import evaluator, renderer
 
 
+# Stands for the attributes of every context as they are now. Whenever any
+# context changes, it is replaced, so that a call site that has looked up a
+# function on a context can tell whether the lookup is still good. A context
+# may be overlaid on another, so a change to one can affect lookups on others.
+version = object()
+
+def changed():
+    '''Note that a context has changed. Setting and deleting the attributes
+    of a Context does this, but changing its __dict__ directly doesn’t.'''
+    global version
+    version = object()
+
+
 class Context:
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        changed()
+
+    def __delattr__(self, name):
+        super().__delattr__(name)
+        changed()
+
     def eval(self, markup, raw=False, tight=False):
         return evaluator.eval_page(markup, self, raw=raw, tight=tight)
 
@@ -13,21 +34,21 @@ class Context:
 
     @evaluator.raw
     def _if(self, cond, body):
-        if eval(cond, self.__dict__):
+        if eval(evaluator.compile_expr(cond), self.__dict__):
             return self.eval(body, raw=True, tight=True)
         else:
             return ''
 
     @evaluator.raw
-    def loop(self, seq, body):
-        ret = ''
-        for elt in eval(seq, self.__dict__):
+    @evaluator.writes
+    def loop(self, write, seq, body):
+        for elt in eval(evaluator.compile_expr(seq), self.__dict__):
             # TODO: Use an overlay here.
             old = self.__dict__.copy()
             self.__dict__.update(elt)
-            ret += self.eval(body, raw=True, tight=True)
+            changed()
+            write(self.eval(body, raw=True, tight=True))
             self.__dict__ = old
-        return ret
 
 setattr(Context, 'if', Context._if)
 
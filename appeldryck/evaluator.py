@@ -1,12 +1,15 @@
 from dataclasses import dataclass
+from functools import partial
 import inspect
 import logging
 import re
 
+from . import cache
+from . import compiler
+from . import concurrency
+from . import output
 from .parser import ast
-from .parser.lex import lexer
-from .parser.parse import parser
-from .parser.rawparse import raw_parser
+from .parser import session
 
 
 logger = logging.getLogger(__name__)
@@ -25,6 +28,7 @@ def raw(f):
     text of its argument. By default, arguments are evaluated before the
     function is applied."""
     f._dryck_raw = True
+    f._dryck_props = read_func_props(f)
     return f
 
 
@@ -32,6 +36,7 @@ def block(f):
     """Decorator for a dryck function that should have its argument evaluated
     in block context instead of the default span context."""
     f._dryck_block = True
+    f._dryck_props = read_func_props(f)
     return f
 
 
@@ -39,6 +44,7 @@ def indented(f):
     """Decorator for a dryck function whose output should be automatically
     indented to match the indent at which the function call appeared."""
     f._dryck_indented = True
+    f._dryck_props = read_func_props(f)
     return f
 
 
@@ -46,6 +52,7 @@ def pyargs(f):
     """Decorator for a dryck function that takes Python expressions instead
     of text as its arguments."""
     f._dryck_pyargs = True
+    f._dryck_props = read_func_props(f)
     return f
 
 
@@ -53,58 +60,254 @@ def glom(f):
     """Decorator for a dryck function that, if used as the entirety of a paragraph,
     completely replaces the paragraph such that no enclosing tag is emitted."""
     f._dryck_glom = True
+    f._dryck_props = read_func_props(f)
     return f
 
 
-@dataclass
+def writes(f):
+    """Decorator for a dryck function that passes its markup, piece by piece,
+    to a write function, which it is given before its arguments, instead of
+    returning it."""
+    f._dryck_writes = True
+    f._dryck_props = read_func_props(f)
+    return f
+
+
+def memoize(*depends):
+    """Decorator for a pure dryck function, whose markup depends only on its
+    arguments and on the context attributes named by depends, so that its
+    results can be cached, from one call and one page to the next. Without
+    any names, it can be used bare, as @memoize."""
+    if len(depends) == 1 and callable(depends[0]):
+        return memoize()(depends[0])
+
+    def decorator(f):
+        f._dryck_memoize = depends
+        f._dryck_props = read_func_props(f)
+        return f
+    return decorator
+
+
+@dataclass(frozen=True)
 class Props:
     lazy: bool
     block: bool
     indented: bool
     pyargs: bool
     glom: bool
+    writes: bool
+    # The attributes a @memoize function depends on, or None if it isn’t one.
+    memoize: tuple | None
 
 
-def get_func_props(fn):
+def read_func_props(fn):
     return Props(
         lazy=hasattr(fn, '_dryck_raw'),
         block=hasattr(fn, '_dryck_block'),
         indented=hasattr(fn, '_dryck_indented'),
         pyargs=hasattr(fn, '_dryck_pyargs'),
-        glom=hasattr(fn, '_dryck_glom')
+        glom=hasattr(fn, '_dryck_glom'),
+        writes=hasattr(fn, '_dryck_writes'),
+        memoize=getattr(fn, '_dryck_memoize', None)
     )
 
+# The props of a function with none of the decorators.
+PLAIN = read_func_props(None)
+
 
-def apply_func(fn, args, env, raw, indent):
+def get_func_props(fn):
+    # The decorators work out the props of what they decorate,
+    # so that we needn’t for every call.
+    return getattr(fn, '_dryck_props', PLAIN)
+
+
+def apply_func(fn, args, env, raw, indent, props=None):
+    '''The markup of a call to fn.'''
+    parts = []
+    write_func(parts.append, fn, args, env, raw, indent, props)
+    return ''.join(parts)
+
+
+def write_func(write, fn, args, env, raw, indent, props=None):
+    '''Pass the markup of a call to fn to write.'''
     # TODO: What to do if meta variables get returned?
-    # Read function decorators.
-    props = get_func_props(fn)
+    # Read function decorators, unless the caller already has.
+    if props is None:
+        props = get_func_props(fn)
 
     if props.pyargs and props.lazy:
         raise Exception(f'Dryck function {fn} cannot be both pyargs and lazy')
 
     if props.pyargs:
-        parsed_args = [eval(arg, env.__dict__)
+        parsed_args = [eval(compile_expr(arg.text), env.__dict__)
                        for arg in args]
     elif not props.lazy:
         # TODO: Plumb current_token here.
-        parsed_args = [eval_page(arg, env, tight=(not props.block), raw=raw, name=f'arg {i+1} of {fn.__name__}')
+        parsed_args = [eval_doc(get_arg_doc(arg, raw), env, tight=(not props.block), raw=raw, name=f'arg {i+1} of {fn.__name__}')
                        for (i, arg) in enumerate(args)]
     else:
-        parsed_args = args
-
-    ret = fn(*parsed_args)
+        parsed_args = [arg.text for arg in args]
 
     # TODO: Don't emit trailing whitespace!
     logger.debug(f'indent is {indent} and indented is {props.indented} for {fn.__name__}')
     if props.indented:
-        if len(ret) > 0 and ret[-1] == '\n':
-            ret = ret[:-1]
-        ret = ret.replace('\n', '\n' + ' ' * indent)
+        # The markup is indented as it is written.
+        write = output.Indenter(write, indent).write
+
+    for arg in parsed_args:
+        if arg.__class__ is str and concurrency.MARK in arg:
+            # An argument is waiting on async calls, and so the call must wait too.
+            write(defer(call_markup, (fn, env, props, *parsed_args), props.indented))
+            return
+    write_call(write, fn, parsed_args, env, props)
+
+
+def call_markup(fn, env, props, *parsed_args):
+    '''The markup fn makes of parsed_args.'''
+    parts = []
+    write_call(parts.append, fn, parsed_args, env, props)
+    return ''.join(parts)
+
+
+def write_call(write, fn, parsed_args, env, props):
+    '''Pass the markup fn makes of parsed_args to write, or what it made of
+    them last time, if it is @memoize.'''
+    if props.memoize is None:
+        call_func(write, fn, parsed_args, props)
+        return
+
+    # What gets cached is the markup of the call, before it is indented.
+    key = memo_key(fn, parsed_args, env, props.memoize)
+    if key is None:
+        call_func(write, fn, parsed_args, props)
+        return
+    name = f'{fn.__module__}.{fn.__qualname__}'
+    ret = memo_cache.lookup(name, key)
+    if ret is None:
+        parts = []
+        call_func(parts.append, fn, parsed_args, props)
+        ret = ''.join(parts)
+        # Markup waiting on async calls only makes sense in this rendering.
+        if concurrency.MARK not in ret:
+            memo_cache.put(key, ret)
+    write(ret)
+
+
+def call_func(write, fn, parsed_args, props):
+    '''Pass the markup fn makes of parsed_args to write.'''
+    if props.writes:
+        ret = fn(write, *parsed_args)
+        if ret is not None:
+            raise Exception(f'Expected {fn} to write its markup, but it returned {ret}')
+        return
 
+    ret = fn(*parsed_args)
+    if ret.__class__ is not str and inspect.iscoroutine(ret):
+        # An async function. Its markup may come later, in a placeholder.
+        ret = concurrency.call(ret, props.indented, reporter())
     if not isinstance(ret, str):
         raise Exception(f'Expected {fn} to return str, but got {ret}')
-    return ret
+    write(ret)
+
+
+def consume(fn, text):
+    '''What fn, such as env.p, makes of markup text, checked.
+    If text is waiting on async calls, so is fn.'''
+    if concurrency.MARK in text:
+        return defer(consume, (fn, text))
+    return output.check(fn(text))
+
+
+def made_at(calls):
+    '''Where the documents being evaluated under gather are now, innermost
+    last: the current node of each, the document, and how it is evaluated.'''
+    return [(current_token[0], doc, env, raw, name)
+            for (current_token, doc, env, raw, name) in calls.where]
+
+
+def relocated(e, frames):
+    '''The exception to raise from e, which went wrong in a call made at
+    frames, as eval_doc would have raised it, had the call been made then.'''
+    for (node, doc, env, raw, name) in reversed(frames):
+        outer = located(e, doc, node, raw, name)
+        outer.__cause__ = e
+        e = outer
+    return e
+
+
+def reporter():
+    '''What makes of an exception from an async call made now the one that
+    eval_doc would raise, had the call failed now, or None, if calls aren’t
+    being gathered, and so fail now.'''
+    calls = concurrency.current.get()
+    if calls is None or not calls.where:
+        return None
+    frames = made_at(calls)
+    return lambda e: e if type(e) is SuppressPageGenerationException else relocated(e, frames)
+
+
+def defer(fn, args, indented=False):
+    '''A placeholder for fn(*args), which waits on the markup among args.
+    It is called as it would be now, on the attributes the context has now,
+    such as the item of a ◊loop, and fails as it would fail now. What it
+    sets on the context, though, is forgotten, since it comes too late.'''
+    calls = concurrency.current.get()
+    if calls is None or not calls.where:
+        return concurrency.later(fn, args, indented)
+    frames = made_at(calls)
+    env = frames[-1][2]
+    return concurrency.later(resume, (fn, env, env.__dict__.copy(), frames, *args), indented)
+
+
+def resume(fn, env, state, frames, *args):
+    '''Call fn(*args), which was deferred at frames, with env as it was then.'''
+    calls = concurrency.current.get()
+    (now, outer) = (env.__dict__, calls.where)
+    env.__dict__ = state
+    # The documents it evaluates are within those it was called from.
+    calls.where = [([node], doc, context, raw, name)
+                   for (node, doc, context, raw, name) in frames]
+    try:
+        return fn(*args)
+    except Exception as e:
+        if type(e) is SuppressPageGenerationException:
+            raise
+        raise relocated(e, frames)
+    finally:
+        env.__dict__ = now
+        calls.where = outer
+
+
+def line_end(text):
+    '''What follows a glommed paragraph, whose markup is text.'''
+    return '' if text.endswith('\n') else '\n'
+
+
+# The results of @memoize functions, keyed by memo_key. Navigation menus,
+# tag clouds and the like are called with the same arguments on every page.
+memo_cache = cache.MemoCache(maxsize=4096)
+
+def memo_key(fn, parsed_args, env, depends):
+    '''What a call to a @memoize function depends on, or None
+    if any of it can’t be hashed, and so can’t be cached.'''
+    # The same function, looked up on different contexts, is a different bound method.
+    key = (getattr(fn, '__func__', fn), tuple(parsed_args),
+           tuple(getattr(env, name, None) for name in depends))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def get_arg_doc(arg, raw):
+    """The parsed markup of a function argument."""
+    if arg.doc is None:
+        # The argument couldn’t be parsed along with the rest of its document.
+        # Try again on its own, so that the parse error reaches the user.
+        with session.acquire() as s:
+            arg.doc = s.parse_arg(arg, raw)
+    return arg.doc
 
 
 def combine_until_close(tokens, multi=False):
@@ -132,11 +335,13 @@ def combine_until_close(tokens, multi=False):
     return out
 
 
-def eval_text(elements, env, raw, current_token) -> tuple[str, bool]:
-    text = ''
+def eval_text(elements, env, raw, current_token, parts) -> bool:
+    '''Add the markup of elements to the list parts, and return whether to glom.'''
     # To glom is to suppress the enclosing paragraph.
     # We do this if we consist of a single function call that identifies itself as glomming.
     glom = False
+    # The indentation of the last line, followed as parts grows.
+    line = None
 
     for t in elements:
         current_token[0] = t
@@ -144,61 +349,141 @@ def eval_text(elements, env, raw, current_token) -> tuple[str, bool]:
         match t:
 
             case ast.Eval():
-                methods = {x: getattr(env, x) for x in dir(env)
-                        if inspect.ismethod(getattr(env, x))}
-                methods['__context__'] = env
-                ret = eval(t.expr.rstrip(), env.__dict__, methods)
-                if not isinstance(ret, str):
-                    raise Exception(f'Expected eval to return str, but got {ret}')
-                text += ret
+                parts.append(eval_expr(t.expr.rstrip(), env))
 
             case ast.Apply():
                 # A ◊foo followed by one or more {expr}'s
                 # is a function call with arguments.
                 # A plain ◊foo with no args
                 # can be either a variable or a nullary function call.
-                indent = get_indent(text)
+                if line is None:
+                    line = output.Line()
+                indent = line.indent(parts)
                 fn = getattr(env, t.func)
                 if callable(fn):
                     if len(elements) == 1 and get_func_props(fn).glom:
                         glom = True
-                    ret = apply_func(fn, t.args, env, raw, indent)
-                    text += ret
+                    write_func(parts.append, fn, t.args, env, raw, indent)
                 elif len(t.args) == 0:
-                    text += fn
+                    parts.append(output.check(fn))
                 else:
                     raise DryckException('Tried to pass args to a non-callable')
 
             case ast.Link():
-                indent = get_indent(text)
-                text += apply_func(env.wiki_link, (t.dest, t.label), env, raw, indent)
+                if line is None:
+                    line = output.Line()
+                indent = line.indent(parts)
+                write_func(parts.append, env.wiki_link, (t.dest, t.label), env, raw, indent)
 
             case ast.Text():
-                text += t.text
+                parts.append(t.text)
 
             case ast.Soft():
                 pass
 
             case ast.Star():
-                text += env.em(eval_text(t.text, env, raw, current_token)[0])
+                text = []
+                eval_text(t.text, env, raw, current_token, text)
+                parts.append(consume(env.em, ''.join(text)))
 
             case ast.Break():
-                text += env.br()
+                parts.append(output.check(env.br()))
 
             case _:
                 raise Exception('Bad element: ' + str(t))
 
-    return (text, glom)
+    return glom
 
 
-def eval_page(page_text, env, raw=False, tight=False, name=None, debug=False):
-    body = ''
+class Namespace(dict):
+    '''The local names of a ◊{} expression: the methods of the context, and
+    the context itself as __context__. The context’s variables are the
+    globals, so that its methods come first, as they would in a dict of all
+    of them, but here each is only looked up when the expression uses it.
+    A context can have hundreds of methods, and binding every one of them
+    for every expression took longer than the rest of rendering.'''
 
-    # The lexer is global so we have to reset here.
-    # Don’t talk to me about threading.
-    lexer.lineno = 1
+    __slots__ = ('env',)
 
+    def __init__(self, env):
+        super().__init__(__context__=env)
+        self.env = env
+
+    def __missing__(self, name):
+        try:
+            value = getattr(self.env, name)
+        except AttributeError:
+            raise KeyError(name) from None
+        if not inspect.ismethod(value):
+            # Leave it to the globals, or the builtins.
+            raise KeyError(name)
+        return value
+
+
+def eval_expr(expr, env):
+    '''Evaluate the Python expression of a ◊{}, as source or compiled code.'''
+    if isinstance(expr, str):
+        expr = compile_expr(expr)
+    ret = eval(expr, env.__dict__, Namespace(env))
+    if not isinstance(ret, str):
+        raise Exception(f'Expected eval to return str, but got {ret}')
+    return ret
+
+
+def eval_page(page_text, env, raw=False, tight=False, name=None, debug=False, out=None):
+    return eval_doc(parse_page(page_text, raw, debug), env, raw, tight, name, out)
+
+
+async def eval_page_async(page_text, env, raw=False, tight=False, name=None, debug=False):
+    '''Evaluate a page as eval_page does, running the async dryck functions
+    it calls concurrently, and return its markup.'''
+    return await concurrency.gather(eval_page, page_text, env, raw, tight, name, debug)
+
+
+def stream_page(pieces, env, out, raw=False, name=None):
+    '''Evaluate a document whose text comes in pieces, such as the lines of
+    a file, writing the markup to out a few blocks at a time as they are
+    parsed, so that neither the document nor its markup is ever whole.
+    The metadata definitions, which are at the top, still come first.'''
+    with session.acquire() as s:
+        for doc in s.stream(pieces, raw):
+            eval_doc(doc, env, raw, name=name, out=out)
+
+
+# Parsed documents, keyed by (text, raw). Templates, partials and
+# ◊if/◊loop bodies are evaluated over and over, but only need parsing once.
+# A parsed document takes about thirty times the memory of its text, so the
+# cache is bounded by the length of the texts too. Small documents, which are
+# the ones used over and over, stay, while the pages of a build, each rendered
+# once, pass through.
+parse_cache = cache.LRUCache(maxsize=256, maxweight=1 << 20,
+                             weigh=lambda key, doc: len(key[0]))
+
+# Compiled Python expressions, keyed by (source, mode): those of ◊{}, @pyargs
+# arguments, and ◊if and ◊loop, which are evaluated over and over.
+code_cache = cache.LRUCache(maxsize=1024)
+
+def compile_expr(source, mode='eval'):
+    '''Compile Python source as eval would, or fetch it from the cache.'''
+    key = (source, mode)
+    code = code_cache.get(key)
+    if code is None:
+        # eval strips leading spaces and tabs from source, but compile doesn’t.
+        code = compile(source.lstrip(' \t'), '<string>', mode)
+        code_cache.put(key, code)
+    return code
+
+
+# Parsed source files, kept from one build to the next.
+# Set this to None to always parse files afresh.
+document_cache = cache.DocumentCache(cache.cache_dir('documents'))
+
+
+def parse_page(page_text, raw=False, debug=False, persist=False):
+    '''Parse a document, or fetch it from the cache if we’ve seen it before.
+    Documents read from files should be persisted, to be reused across builds.'''
     if debug:
+        # Debugging is all about watching the parser work, so skip the cache.
         import logging
         logging.basicConfig(
             level = logging.DEBUG,
@@ -206,16 +491,54 @@ def eval_page(page_text, env, raw=False, tight=False, name=None, debug=False):
             filemode = 'w',
             format = "%(filename)10s:%(lineno)4d:%(message)s")
         log = logging.getLogger()
+        with session.acquire() as s:
+            return s.parse(page_text, raw=raw, tracking=True, debug=log)
+
+    key = (page_text, raw)
+    doc = parse_cache.get(key)
+    if doc is None:
+        disk = document_cache if persist else None
+        if disk:
+            doc = disk.get(page_text, raw)
+        if doc is None:
+            with session.acquire() as s:
+                doc = s.parse(page_text, raw=raw)
+            if disk:
+                disk.put(page_text, raw, doc)
+        parse_cache.put(key, doc)
+    return doc
+
+
+def update_page(doc, page_text, raw=False):
+    '''Parse an edited document, parsing again only the blocks that the edit
+    touched. doc, parsed from the text before the edit, is used up.'''
+    parse_cache.pop((doc.source.text, raw))
+    with session.acquire() as s:
+        doc = s.update(doc, page_text, raw)
+    parse_cache.put((page_text, raw), doc)
+    return doc
+
+
+def eval_doc(doc, env, raw=False, tight=False, name=None, out=None):
+    '''The markup of a parsed document. If out is given,
+    the markup is written to it instead of returned.'''
+    if out is None:
+        parts = []
+        write = parts.append
     else:
-        log = False
-    if raw:
-        doc = raw_parser.parse(page_text, tracking=True, debug=log)
-    else:
-        doc = parser.parse(page_text, tracking=True, debug=log)
+        write = out.write
 
     if tight and not raw and len(doc.text) > 1:
         raise DryckException('Too many paragraphs in tight argument: ' + str(doc))
 
+    # Save the current token for use in error handling.
+    # Box the token stash so we can mutate it inside subroutines.
+    current_token = [doc]
+    # Calls deferred under gather fail after we return, so they are told
+    # where they were made.
+    calls = concurrency.current.get()
+    if calls is not None:
+        calls.where.append((current_token, doc, env, raw, name))
     try:
         # State manipulators.
         # These don't directly affect the final markup.
@@ -223,55 +546,86 @@ def eval_page(page_text, env, raw=False, tight=False, name=None, debug=False):
         for md in doc.metatext:
             setattr(env, md.key, md.val)
 
-        for p in doc.text:
-            # Save the current token for use in error handling.
-            # Box the token stash so we can mutate it inside subroutines.
-            current_token = [p]
-            match p:
-
-                case ast.Raw():
-                    assert raw, 'Raw AST node in non-raw context; probably a parser bug'
-                    (text, _) = eval_text(p.text, env, raw, current_token)
-                    body += text
-
-                case ast.Paragraph():
-                    (text, glom) = eval_text(p.text, env, raw, current_token)
-                    body += text if tight or glom else env.p(text)
-                    if glom and not text.endswith('\n'):
-                        body += '\n'
-
-                case ast.Itemized():
-                    items = ''
-                    for item in p.items:
-                        (text, _) = eval_text(item.text, env, raw, current_token)
-                        items += env.li(text)
-                    body += env.ul(items)
-
-                case ast.Heading():
-                    (text, _) = eval_text(p.text, env, raw, current_token)
-                    body += env.heading(p.level, text)
-
-                case _:
-                    raise Exception('Bad block: ' + str(p))
-
+        # Documents evaluated over and over are compiled, and run as Python.
+        render = compiler.compiled(doc)
+        if render is not None:
+            render(env, raw, tight, current_token, write)
+        else:
+            eval_blocks(doc, env, raw, tight, current_token, write)
 
     except Exception as e:
         if type(e) is SuppressPageGenerationException:
             raise
         else:
-            (lineno, _) = current_token[0].linespan
-            (lexpos, _) = current_token[0].lexspan
-            # From https://ply.readthedocs.io/en/latest/ply.html
-            line_start = page_text.rfind('\n', 0, lexpos)
-            col = lexpos - line_start
-            # Maybe using both add_note and “raise from” is a bit of a
-            # belt-and-suspenders approach.
-            # But it does make exception stacks a lot easier for the user to read.
-            where = f'line {lineno} col {col}' + f' of {name}' if name else ''
-            e.add_note(f'while rendering {where}')
-            raise DryckException(f'Error {where}') from e
-
-    return body
+            raise located(e, doc, current_token[0], raw, name) from e
+    finally:
+        if calls is not None:
+            calls.where.pop()
+
+    if out is None:
+        return ''.join(parts)
+
+
+def located(e, doc, node, raw, name):
+    '''The DryckException to raise from e, which went wrong at node of doc.'''
+    lexpos = locate(doc, node, raw).start
+    lineno = doc.source.line(lexpos)
+    col = doc.source.col(lexpos)
+    # Maybe using both add_note and “raise from” is a bit of a
+    # belt-and-suspenders approach.
+    # But it does make exception stacks a lot easier for the user to read.
+    where = f'line {lineno} col {col}' + f' of {name}' if name else ''
+    e.add_note(f'while rendering {where}')
+    return DryckException(f'Error {where}')
+
+
+def eval_blocks(doc, env, raw, tight, current_token, write):
+    '''Pass the markup of the blocks of a document to write, interpreted node
+    by node. compiler.compile_doc makes functions that do just the same.'''
+    for p in doc.text:
+        current_token[0] = p
+        match p:
+
+            case ast.Raw():
+                assert raw, 'Raw AST node in non-raw context; probably a parser bug'
+                eval_text(p.text, env, raw, current_token, output.Stream(write))
+
+            case ast.Paragraph():
+                text = []
+                glom = eval_text(p.text, env, raw, current_token, text)
+                text = ''.join(text)
+                write(text if tight or glom else consume(env.p, text))
+                if glom and not text.endswith('\n'):
+                    # Unless the end of text is yet to come, this is a newline.
+                    write(consume(line_end, text))
+
+            case ast.Itemized():
+                items = []
+                for item in p.items:
+                    text = []
+                    eval_text(item.text, env, raw, current_token, text)
+                    items.append(consume(env.li, ''.join(text)))
+                write(consume(env.ul, ''.join(items)))
+
+            case ast.Heading():
+                text = []
+                eval_text(p.text, env, raw, current_token, text)
+                write(consume(partial(env.heading, p.level), ''.join(text)))
+
+            case _:
+                raise Exception('Bad block: ' + str(p))
+
+
+def locate(doc, node, raw):
+    '''Documents are parsed without tracking positions, which is faster,
+    so most of their nodes don’t know where they are. When we need to,
+    parse the document again with tracking, and find the node’s twin.'''
+    with session.acquire() as s:
+        tracked = s.reparse(doc, raw)
+    for (untracked, twin) in zip(ast.walk(doc), ast.walk(tracked)):
+        if untracked is node:
+            return twin
+    return node
 
 
 WHITESPACE_RE = re.compile(r'[\t ]*')
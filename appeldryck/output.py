@@ -0,0 +1,205 @@
+'''Where markup goes as it is rendered.
+
+The evaluator used to build up markup by adding strings, a node at a time,
+and then adding each paragraph, item and list to the markup around it. Now
+the markup of a document is passed, a piece at a time, to a write function:
+the append method of a list that is joined once, when it is done, or the
+write method of a sink.
+
+A sink is anything with a write method that takes a string, such as an
+open text file or an io.StringIO. Memory, Null and File are sinks for
+rendering to a string, to nowhere, and to a file as the markup comes.'''
+
+import os
+from pathlib import Path
+
+from . import concurrency
+
+
+class Line:
+    '''Follows the indentation of the last line of the markup in a list of
+    pieces, as get_indent would find it, looking at each piece only once
+    however often it is asked.'''
+
+    __slots__ = ('seen', 'spaces', 'open')
+
+    def __init__(self):
+        # How many pieces have been looked at, the spaces at the start of
+        # the last line, and whether there might yet be more of them.
+        self.seen = 0
+        self.spaces = 0
+        self.open = True
+
+    def indent(self, parts):
+        '''The indentation of the last line of parts.'''
+        for i in range(self.seen, len(parts)):
+            piece = parts[i]
+            # A Stream keeps the markup of an Indenter with its indentation.
+            pad = ''
+            if piece.__class__ is tuple:
+                (piece, pad) = piece
+            if concurrency.MARK in piece:
+                # The markup of an async call isn’t known yet. Take it
+                # to be text, on the line it starts on.
+                piece = concurrency.PLACEHOLDER_RE.sub('\x01', piece)
+            newline = piece.rfind('\n')
+            if newline >= 0:
+                piece = piece[newline + 1:]
+                self.spaces = len(pad)
+                self.open = True
+            if self.open:
+                rest = piece.lstrip(' ')
+                self.spaces += len(piece) - len(rest)
+                if rest:
+                    self.open = False
+        self.seen = len(parts)
+        return self.spaces
+
+
+def passes_on(write):
+    '''The Indenter or Stream whose write method write is, if it is one.'''
+    owner = getattr(write, '__self__', None)
+    if owner.__class__ is Indenter or owner.__class__ is Stream:
+        return owner
+    return None
+
+
+def indent_to(outer, out, markup, pad):
+    '''Write markup, each newline of which is followed by pad, with out,
+    or pass it on to outer, what out belongs to, to be indented further.'''
+    if outer is not None:
+        outer.add(markup, pad)
+    elif pad:
+        out(markup.replace('\n', '\n' + pad))
+    else:
+        out(markup)
+
+
+class Stream(list):
+    '''The pieces of the markup of a raw block, which can be a whole
+    template, written as they come instead of being joined first.
+    The pieces are kept, though, so that a Line can follow them.'''
+
+    __slots__ = ('out', 'outer')
+
+    def __init__(self, write):
+        self.out = write
+        self.outer = passes_on(write)
+
+    def append(self, markup):
+        list.append(self, markup)
+        self.out(markup)
+
+    def add(self, markup, pad):
+        '''Write markup from an Indenter, which is to be indented by pad.'''
+        list.append(self, (markup, pad) if pad else markup)
+        indent_to(self.outer, self.out, markup, pad)
+
+
+class Indenter:
+    '''Indents the output of an @indented function as it is written: each
+    newline is followed by the indentation of the call, except a last one,
+    which is dropped. A newline is held back until more markup comes,
+    to see whether it is the last.
+
+    The output of an @indented function called by another goes straight
+    through to the outermost Indenter, which indents it by both at once,
+    so that deeply nested markup isn’t copied once per level.'''
+
+    __slots__ = ('out', 'outer', 'pad', 'pending')
+
+    def __init__(self, write, indent):
+        self.out = write
+        self.outer = passes_on(write)
+        self.pad = ' ' * indent
+        # The indentation to follow a newline held back, if there is one.
+        self.pending = None
+
+    def write(self, markup):
+        self.add(markup, '')
+
+    def add(self, markup, pad):
+        '''Write markup, each newline of which is followed
+        by the indentation pad, and then by our own.'''
+        if not markup:
+            return
+        if self.pending is not None:
+            indent_to(self.outer, self.out, '\n', self.pending)
+            self.pending = None
+        # A newline followed by indentation from further in isn’t the last.
+        if markup[-1] == '\n' and not pad:
+            self.pending = self.pad
+            markup = markup[:-1]
+        if markup:
+            indent_to(self.outer, self.out, markup, self.pad + pad)
+
+
+def check(markup):
+    '''Fail as adding markup to a string would, if it isn’t one. What comes
+    back from a context, such as the value of a variable or what env.p
+    makes of a paragraph, is written unchecked, and a list of pieces
+    would only fail when it was joined, far from what went wrong.'''
+    return markup if markup.__class__ is str else '' + markup
+
+
+class Memory:
+    '''A sink that keeps its markup in memory, as a list of pieces
+    until somebody needs it as one string.'''
+
+    def __init__(self):
+        self.parts = []
+        self.write = self.parts.append
+
+    def getvalue(self):
+        '''All the markup written so far.'''
+        return ''.join(self.parts)
+
+
+class Null:
+    '''A sink that throws its markup away, noting only how much there was,
+    for measuring what rendering costs without keeping what it makes.'''
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, markup):
+        self.size += len(markup)
+
+
+class Writer:
+    '''A sink that passes its markup to a write function,
+    such as the one an @writes function is given.'''
+
+    __slots__ = ('write',)
+
+    def __init__(self, write):
+        self.write = write
+
+
+class File:
+    '''A sink that writes its markup to a file as it comes, so that a page
+    needn’t be held in memory. Use it in a with statement. Until that ends
+    without an exception, the markup goes to a partial file beside path,
+    which then replaces path, so that a page that fails halfway, or that
+    calls discard because it suppressed itself, leaves nothing behind.'''
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.partial = self.path.with_name(self.path.name + '.partial')
+        self.discarded = False
+
+    def __enter__(self):
+        self.file = open(self.partial, 'w')
+        self.write = self.file.write
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.file.close()
+        if kind is None and not self.discarded:
+            os.replace(self.partial, self.path)
+        else:
+            os.unlink(self.partial)
+
+    def discard(self):
+        '''Leave path as it was, and throw away what has been written.'''
+        self.discarded = True
@@ -1,78 +1,203 @@
-from dataclasses import dataclass
-from typing import List, Tuple
-
-
-@dataclass
+import bisect
+import re
+from dataclasses import dataclass, field, fields
+from typing import List, Optional, Tuple
+
+
+NEWLINE_RE = re.compile('\n')
+
+class Source:
+    '''The text of a source document. Nodes only record character offsets into
+    it; line and column numbers are worked out when somebody asks for them.
+    A document parsed a few blocks at a time has a source for each part,
+    beginning at the start of line lineno.'''
+
+    __slots__ = ('text', '_newlines', 'lineno')
+
+    def __init__(self, text, lineno=1):
+        self.text = text
+        self._newlines = None
+        self.lineno = lineno
+
+    def line(self, pos):
+        '''The 1-based line number of offset pos.'''
+        if self._newlines is None:
+            self._newlines = [m.start() for m in NEWLINE_RE.finditer(self.text)]
+        return bisect.bisect_left(self._newlines, pos) + self.lineno
+
+    def col(self, pos):
+        '''The 1-based column number of offset pos.'''
+        return pos - self.text.rfind('\n', 0, pos)
+
+    def replace(self, text, prefix=0, suffix=0):
+        '''Change the text, as when the document is edited and reparsed
+        incrementally. Nodes that the edit moved have to be shifted.
+        If the new text begins with the first prefix characters of the old,
+        and ends with the last suffix, the index of lines is kept.'''
+        newlines = self._newlines
+        if newlines is not None:
+            delta = len(text) - len(self.text)
+            i = bisect.bisect_left(newlines, prefix)
+            j = bisect.bisect_left(newlines, len(self.text) - suffix)
+            kept = newlines[j:]
+            newlines[i:] = [m.start() for m in NEWLINE_RE.finditer(text, prefix, len(text) - suffix)]
+            newlines.extend(pos + delta for pos in kept)
+        self.text = text
+
+
+# Parsed documents can be large, so the nodes have slots rather than dicts,
+# and record their spans as two plain offsets into the source.
+# As with PLY’s lexspan, end is where the node’s last token begins,
+# except that an Arg or Document spans exactly its text. Only those two
+# are reliable unless the document was parsed with position tracking.
+
+@dataclass(slots=True)
 class Node:
-    linespan: Tuple[int, int]
-    lexspan: Tuple[int, int]
+    start: int
+    end: int
 
-@dataclass
+@dataclass(slots=True)
 class Def(Node):
     key: str
     val: str
 
-@dataclass
+@dataclass(slots=True)
+class Arg(Node):
+    # The argument’s text is sliced out of the source on demand,
+    # since only @raw and @pyargs functions need it.
+    source: Source = field(repr=False, compare=False)
+    # Parsed when the enclosing document is parsed,
+    # or None if the text isn’t valid markup.
+    doc: Optional['Document'] = None
+
+    @property
+    def text(self):
+        return self.source.text[self.start:self.end]
+
+@dataclass(slots=True)
 class Element(Node):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class Eval(Element):
     expr: str
 
-@dataclass
+@dataclass(slots=True)
 class Apply(Element):
     func: str
-    args: List[str]
+    args: List[Arg]
 
-@dataclass
+@dataclass(slots=True)
 class Link(Element):
-    dest: str
-    label: str
+    dest: Arg
+    label: Arg
 
-@dataclass
+@dataclass(slots=True)
 class Text(Element):
     text: str
 
-@dataclass
+@dataclass(slots=True)
 class Soft(Element):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class Break(Element):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class Star(Element):
     text: List[Element]
 
-@dataclass
+@dataclass(slots=True)
 class Block(Node):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class Heading(Block):
     text: List[Element]
     level: int
 
-@dataclass
+@dataclass(slots=True)
 class Raw(Block):
     text: List[Element]
 
-@dataclass
+@dataclass(slots=True)
 class Paragraph(Block):
     text: List[Element]
 
-@dataclass
+@dataclass(slots=True)
 class Item(Node):
     text: List[Element]
 
-@dataclass
+@dataclass(slots=True)
 class Itemized(Block):
     items: List[Item]
     ordered: bool
 
-@dataclass
+@dataclass(slots=True)
 class Document(Node):
     metatext: List[Def]
     text: List[Block]
+    # The whole source text. Spans are offsets into it,
+    # even for the documents of function arguments.
+    source: Source = field(repr=False, compare=False)
+    # Where each of the breaks between blocks begins, in the whole source,
+    # so that an edited document can be reparsed a few blocks at a time.
+    breaks: Tuple[int, ...] = ()
+    # How many times the document has been evaluated, until it has been
+    # evaluated often enough to be compiled, and then its compiled form.
+    compiled: object = field(default=0, repr=False, compare=False)
+
+    def __getstate__(self):
+        # Compiled code doesn’t pickle, and is soon made again.
+        (_, slots) = object.__getstate__(self)
+        return (None, slots | {'compiled': 0})
+
+
+def walk(node):
+    '''Yields node and the nodes within it, in document order.
+    Function arguments are leaves: their documents aren’t walked.'''
+    yield node
+    if isinstance(node, Arg):
+        return
+    for f in fields(node):
+        value = getattr(node, f.name)
+        if isinstance(value, Node):
+            yield from walk(value)
+        elif isinstance(value, list):
+            for child in value:
+                if isinstance(child, Node):
+                    yield from walk(child)
+
+
+def shift(node, delta):
+    '''Moves node, and the nodes within it, delta characters along the source.
+    Unlike walk, this goes into the documents of function arguments.'''
+    # Every node of a big document may need moving, so compare types
+    # directly: matching class patterns is several times slower.
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        node.start += delta
+        node.end += delta
+        kind = type(node)
+        if kind is Text:
+            continue
+        if kind is Paragraph or kind is Item or kind is Star or kind is Heading or kind is Raw:
+            stack.extend(node.text)
+        elif kind is Apply:
+            stack.extend(node.args)
+        elif kind is Arg:
+            if node.doc is not None:
+                stack.append(node.doc)
+        elif kind is Link:
+            stack.append(node.dest)
+            # Without a label, the destination stands in for it.
+            if node.label is not node.dest:
+                stack.append(node.label)
+        elif kind is Itemized:
+            stack.extend(node.items)
+        elif kind is Document:
+            stack.extend(node.metatext)
+            stack.extend(node.text)
+            node.breaks = tuple(pos + delta for pos in node.breaks)
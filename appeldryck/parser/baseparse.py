@@ -1,28 +1,62 @@
+from collections import deque
+
 from .ply import yacc
 
 from .lex import tokens
 from . import ast
 
 
+# The tokens that no rule reads the text of, only, at most, the position.
+# The parsing engine doesn’t bother to cut their text out of the source.
+punctuation = {'METAEOL', 'EVAL', 'LBRACE', 'RBRACE', 'HARDBREAK'}
+
+
+def trivial(f):
+    '''Marks a rule that does nothing but pass on its one symbol, p[0] = p[1],
+    or that has no symbols and does nothing at all. The parsing engine does
+    that itself, rather than calling the rule.'''
+    f.trivial = True
+    return f
+
+
+def prepends(f):
+    '''Marks a rule that does nothing but add its first symbol to the front
+    of the list that is its second, p[2].appendleft(p[1]); p[0] = p[2],
+    or that makes an empty list of an empty symbol, p[0] = deque().
+    The parsing engine does that itself, too.'''
+    f.prepends = True
+    return f
+
+
 #
 # Document structure.
 #
+# The grammar is right-recursive, so lists are built from the back.
+# They are deques until they go into a node, so that adding to the front
+# doesn’t copy what’s already there.
+#
 
 def p_document(p):
     'document : defs blanks blocks'
     if p.parser.raw and len(p[2]) > 0:
         # TODO: Ideally we should merge the spans for 2 and 3.
-        p[0] = ast.Document(p.linespan(0), p.lexspan(0), p[1], [ast.Raw(p.linespan(2), p.lexspan(2), [ast.Text(p.linespan(2), p.lexspan(2), p[2])])] + p[3])
-    else:
-        p[0] = ast.Document(p.linespan(0), p.lexspan(0), p[1], p[3])
-
+        p[3].appendleft(ast.Raw(*locate(p, 2), [ast.Text(*locate(p, 2), p[2])]))
+    # A document spans its whole text, which we know without tracking positions.
+    base = p.lexer.base
+    # The breaks were noted from the back.
+    breaks = tuple(reversed(p.lexer.breaks))
+    p[0] = ast.Document(base, base + len(p.lexer.lexdata), list(p[1]), list(p[3]), p.lexer.source, breaks)
+
+@prepends
 def p_defs_list(p):
     'defs : metadata defs'
-    p[0] = [p[1]] + p[2]
+    p[2].appendleft(p[1])
+    p[0] = p[2]
 
+@prepends
 def p_defs_empty(p):
     'defs : empty'
-    p[0] = []
+    p[0] = deque()
 
 def p_blanks(p):
     '''blanks : NEWLINE blanks
@@ -31,14 +65,15 @@ def p_blanks(p):
 
 def p_blocks_list(p):
     'blocks : block BREAK blocks'
+    p.lexer.breaks.append(p.lexer.base + p.lexpos(2))
     if p.parser.raw:
-        p[0] = [p[1], ast.Raw(p.linespan(0), p.lexspan(0), [ast.Text(p.linespan(0), p.lexspan(0), p[2])])] + p[3]
-    else:
-        p[0] = [p[1]] + p[3]
+        p[3].appendleft(ast.Raw(*locate(p), [ast.Text(*locate(p), p[2])]))
+    p[3].appendleft(p[1])
+    p[0] = p[3]
 
 def p_blocks_final(p):
     'blocks : block'
-    p[0] = [p[1]]
+    p[0] = deque([p[1]])
 
 
 #
@@ -48,21 +83,23 @@ def p_blocks_final(p):
 def p_block_elements(p):
     'block : elements'
     # Suppress terminal soft break, so as not to annoy the programmer.
-    elements = p[1]
+    elements = list(p[1])
     if len(elements) > 0 and isinstance(elements[-1], ast.Soft):
         elements = elements[:-1]
     if p.parser.raw:
-        p[0] = ast.Raw(p.linespan(0), p.lexspan(0), elements)
+        p[0] = ast.Raw(*locate(p), elements)
     else:
-        p[0] = ast.Paragraph(p.linespan(0), p.lexspan(0), elements)
+        p[0] = ast.Paragraph(*locate(p), elements)
 
 def p_elements_list(p):
     'elements : element elements'
-    p[0] = p[1] + p[2]
+    p[2].extendleft(reversed(p[1]))
+    p[0] = p[2]
 
+@prepends
 def p_elements_empty(p):
     'elements : empty'
-    p[0] = []
+    p[0] = deque()
 
 
 #
@@ -72,7 +109,7 @@ def p_elements_empty(p):
 def p_metadata(p):
     '''metadata : METATAG METAVAL
                 | METATAG METAVAL METAEOL'''
-    p[0] = ast.Def(p.linespan(0), p.lexspan(0), p[1], p[2])
+    p[0] = ast.Def(*locate(p), p[1], p[2])
 
 
 #
@@ -81,27 +118,16 @@ def p_metadata(p):
 
 def p_eval(p):
     'eval : EVAL arg'
-    p[0] = [ast.Eval(p.linespan(0), p.lexspan(0), p[2])]
+    p[0] = [ast.Eval(*locate(p), p[2].text)]
 
 def p_arg(p):
-    'arg : LBRACE argcomps RBRACE'
-    p[0] = p[2]
-
-def p_argcomps_list(p):
-    'argcomps : argcomp argcomps'
-    p[0] = p[1] + p[2]
-
-def p_argcomps_empty(p):
-    'argcomps : empty'
-    p[0] = ''
-
-def p_argcomp_flat(p):
-    'argcomp : ARG'
-    p[0] = p[1]
-
-def p_argcomp_balanced(p):
-    'argcomp : LBRACE argcomps RBRACE'
-    p[0] = '{' + p[2] + '}'
+    '''arg : LBRACE ARG RBRACE
+           | LBRACE RBRACE'''
+    # The argument spans exactly its text, between the braces.
+    base = p.lexer.base
+    end = base + p.lexpos(len(p) - 1)
+    start = end - len(p[2]) if len(p) == 4 else end
+    p[0] = ast.Arg(start, end, p.lexer.source)
 
 
 #
@@ -110,15 +136,21 @@ def p_argcomp_balanced(p):
 
 def p_apply(p):
     'apply : FUNC arglist'
-    p[0] = [ast.Apply(p.linespan(0), p.lexspan(0), p[1], p[2])]
+    # Note the arguments, so that they can be parsed in turn once we’re done.
+    args = list(p[2])
+    p.lexer.args.extend(args)
+    p[0] = [ast.Apply(*locate(p), p[1], args)]
 
+@prepends
 def p_arglist_list(p):
     'arglist : arg arglist'
-    p[0] = [p[1]] + p[2]
+    p[2].appendleft(p[1])
+    p[0] = p[2]
 
+@prepends
 def p_arglist_empty(p):
     'arglist : empty'
-    p[0] = []
+    p[0] = deque()
 
 
 #
@@ -128,7 +160,17 @@ def p_arglist_empty(p):
 def p_link(p):
     'link : LINK'
     (dest, label) = p[1]
-    p[0] = [ast.Link(p.linespan(0), p.lexspan(0), dest, label)]
+    # Skip over the opening [[ and, if there is a label, the |.
+    start = p.lexer.base + p.lexpos(1) + 2
+    dest_arg = ast.Arg(start, start + len(dest), p.lexer.source)
+    p.lexer.args.append(dest_arg)
+    if label:
+        start += len(dest) + 1
+        label_arg = ast.Arg(start, start + len(label), p.lexer.source)
+        p.lexer.args.append(label_arg)
+    else:
+        label_arg = dest_arg
+    p[0] = [ast.Link(*locate(p), dest_arg, label_arg)]
 
 
 #
@@ -140,13 +182,13 @@ def p_text(p):
     # Recognize soft breaks at the beginning and end of a span,
     # so adjacent functions can suppress them if they elect to.
     # In the middle of a span, we can safely convert newlines to spaces.
-    chars = p[1]
+    chars = ''.join(p[1])
     if p.parser.raw:
-        p[0] = [ast.Text(p.linespan(0), p.lexspan(0), chars)]
+        p[0] = [ast.Text(*locate(p), chars)]
     else:
         out = []
         if chars.startswith('\n'):
-            out.append(ast.Soft(p.linespan(0), p.lexspan(0)))
+            out.append(ast.Soft(*locate(p)))
             chars = chars[1:]
         if chars.endswith('\n'):
             append_soft = True
@@ -154,19 +196,21 @@ def p_text(p):
         else:
             append_soft = False
         if len(chars) > 0:
-            out.append(ast.Text(p.linespan(0), p.lexspan(0), chars.replace('\n', ' ')))
+            out.append(ast.Text(*locate(p), chars.replace('\n', ' ')))
         if append_soft:
-            out.append(ast.Soft(p.linespan(0), p.lexspan(0)))
+            out.append(ast.Soft(*locate(p)))
         p[0] = out
 
+@prepends
 def p_spans_empty(p):
     'spans : empty'
-    p[0] = ''
+    p[0] = deque()
 
 def p_hardbreak(p):
     'hardbreak : HARDBREAK'
-    p[0] = [ast.Break(p.linespan(0), p.lexspan(0))]
+    p[0] = [ast.Break(*locate(p))]
 
+@trivial
 def p_starfield(p):
     '''starfield : eval
                  | apply
@@ -179,6 +223,15 @@ def p_starfield(p):
 # Utilities.
 #
 
+def locate(p, n=0):
+    '''The character span of the nth symbol, as offsets into the whole
+    source even when we’re parsing the text of a function argument.'''
+    (start, end) = p.lexspan(n)
+    base = p.lexer.base
+    return (start + base, end + base)
+
+
+@trivial
 def p_empty(p):
     'empty :'
     pass
@@ -0,0 +1,238 @@
+'''A specialized LR parsing engine for the dryck grammars.
+
+PLY’s LRParser.parse is general: it reads LexTokens one at a time, makes a
+YaccSymbol for every reduction, and checks for debugging, position tracking
+and error recovery at every step. We need none of that for an ordinary parse.
+The engine runs the same LR tables, which the LRParser keeps in arrays
+indexed by state and token type code, as flat lists, straight off a
+fastlex.TokenStream’s arrays. It keeps symbol values and token positions on
+plain stacks, and passes the grammar rules a Production that looks enough like
+PLY’s YaccProduction for them not to care. Rules marked trivial, which only
+pass on a symbol, aren’t called at all, and nor are those that only build
+lists, which are marked as prepending.
+
+Parsing with tracking or debugging still goes through PLY.'''
+
+from collections import deque
+import functools
+import itertools
+
+from .ply import yacc
+from .ply.lex import LexToken
+from . import fastlex
+from . import lex
+
+
+# The end of input comes after the real tokens.
+END = len(lex.tokens)
+
+# An action or goto that the grammar doesn’t allow.
+ERROR = yacc.ERROR
+
+# Stand-ins for the lengths of trivial productions, which the engine reduces
+# without calling their rules: one passes on its symbol, one makes nothing.
+PASS = -1
+NOTHING = -2
+# And of those that build lists: one adds to the front, one starts a list
+# from nothing.
+PREPEND = -3
+NEW_LIST = -4
+
+
+# What the token values of punctuation are made with: nothing.
+SKIP = False
+
+
+class Production(list):
+    '''What a grammar rule sees as p: a list of the values of the symbols
+    being reduced, after p[0] for the result, with their positions if they
+    are tokens. Symbols made by reducing other rules have no position,
+    as when PLY isn’t tracking. There is one for each length of production,
+    filled in afresh for every reduction.'''
+
+    __slots__ = ('positions', 'base', 'lexer', 'parser')
+
+    def __init__(self, length, positions, lexer, parser):
+        super().__init__([None] * (length + 1))
+        self.positions = positions
+        self.lexer = lexer
+        self.parser = parser
+
+    def lexpos(self, n):
+        return self.positions[self.base + n] if n else 0
+
+    def lexspan(self, n):
+        pos = self.positions[self.base + n] if n else 0
+        return (pos, pos)
+
+
+class Engine:
+    '''Runs the tables of an LRParser, without tracking positions.'''
+
+    def __init__(self, parser):
+        self.raw = parser.raw
+        self.errorfunc = parser.errorfunc
+        # Only a few kinds of token have values other than their text,
+        # and the punctuation that no rule reads, like the end, has none.
+        self.token_values = [SKIP if name in parser.punctuation else
+                             None if f is fastlex.text_value else f
+                             for (name, f) in zip(lex.tokens, fastlex.VALUES)] + [SKIP]
+        productions = parser.productions
+
+        # The LRParser’s own tables, which are flat arrays with a row for
+        # each state, indexed by token type code for actions and by
+        # nonterminal number for gotos. Rows are known by their offsets.
+        # Defaulted states reduce whatever the lookahead token: PLY reduces
+        # in them without reading one, lest that disturb the lexer, but
+        # our tokens are already made, so we can just as well read it.
+        # We read lists of them, which are a couple of thousand ints each,
+        # since reading an array makes an int every time.
+        tables = parser.tables
+        if any(tables.codes[name] != code for (name, code) in fastlex.CODES.items()) \
+                or tables.codes['$end'] != END:
+            raise Exception('The parser’s terminals aren’t numbered as fastlex’s tokens are')
+        self.action = list(tables.action)
+        self.goto = list(tables.goto)
+        nonterminal = tables.nonterminals
+
+        # By production number: the nonterminal it makes, its length, or
+        # if its rule is one we can skip calling, what to do instead,
+        # and its rule.
+        self.reductions = [(nonterminal[prod.name], self.length(prod), prod.callable)
+                           for prod in productions]
+        self.longest = max(prod.len for prod in productions)
+
+    @staticmethod
+    def length(prod):
+        if getattr(prod.callable, 'trivial', False):
+            return PASS if prod.len else NOTHING
+        if getattr(prod.callable, 'prepends', False):
+            if prod.len not in (1, 2):
+                raise Exception(f'{prod.name} can’t prepend {prod.len} symbols')
+            return PREPEND if prod.len == 2 else NEW_LIST
+        return prod.len
+
+    def parse(self, lexer):
+        '''Parse the tokens lexer.start made, returning the start symbol’s value.'''
+        text = lexer.lexdata
+        token_values = self.token_values
+
+        action = self.action
+        goto = self.goto
+        reductions = self.reductions
+
+        states = [0]
+        values = [None]
+        positions = [0]
+        push_state = states.append
+        push_value = values.append
+        push_position = positions.append
+        ps = [Production(length, positions, lexer, self) for length in range(self.longest + 1)]
+
+        state = 0
+        # The tokens, and then the end of input.
+        end_of_input = ((END, len(text), len(text)),)
+        tokens = itertools.chain(zip(lexer.types, lexer.starts, lexer.ends), end_of_input)
+        for (code, start, end) in tokens:
+            make_value = token_values[code]
+            if make_value is None:
+                value = text[start:end]
+            elif make_value is SKIP:
+                value = None
+            else:
+                value = make_value(text, start, end)
+
+            # Reduce until the token can be shifted.
+            while True:
+                t = action[state + code]
+                if t > 0:
+                    # Shift.
+                    state = t
+                    push_state(state)
+                    push_value(value)
+                    push_position(start)
+                    break
+                if t == 0:
+                    # Accept.
+                    return values[-1]
+                if t == ERROR:
+                    self.error(lexer, code, start, end)
+
+                (nonterminal, length, rule) = reductions[-t]
+                if length == 1:
+                    # The commonest case, replacing the top of the stacks.
+                    p = ps[1]
+                    p[1] = values[-1]
+                    p[0] = None
+                    p.base = len(values) - 2
+                    rule(p)
+                    values[-1] = p[0]
+                    positions[-1] = 0
+                    state = goto[states[-2] + nonterminal]
+                    states[-1] = state
+                elif length > 1:
+                    # Call the rule, and replace its symbols with the result.
+                    base = len(values) - length
+                    p = ps[length]
+                    p[1:] = values[base:]
+                    p[0] = None
+                    p.base = base - 1
+                    rule(p)
+                    values[base:] = (p[0],)
+                    positions[base:] = (0,)
+                    state = goto[states[base - 1] + nonterminal]
+                    states[base:] = (state,)
+                elif length == PASS:
+                    # Pass on the symbol’s value, though not its position.
+                    positions[-1] = 0
+                    state = goto[states[-2] + nonterminal]
+                    states[-1] = state
+                elif length == PREPEND:
+                    # Add the first symbol to the front of the list after it.
+                    items = values.pop()
+                    items.appendleft(values[-1])
+                    values[-1] = items
+                    del positions[-1]
+                    positions[-1] = 0
+                    del states[-1]
+                    state = goto[states[-2] + nonterminal]
+                    states[-1] = state
+                elif length == NEW_LIST:
+                    # Start a list, in place of the nothing it starts from.
+                    values[-1] = deque()
+                    positions[-1] = 0
+                    state = goto[states[-2] + nonterminal]
+                    states[-1] = state
+                else:
+                    # A rule of no symbols, if it isn’t trivial.
+                    value_made = None
+                    if length == 0:
+                        p = ps[0]
+                        p[0] = None
+                        p.base = len(values) - 1
+                        rule(p)
+                        value_made = p[0]
+                    push_value(value_made)
+                    push_position(0)
+                    state = goto[state + nonterminal]
+                    push_state(state)
+
+    def error(self, lexer, code, start, end):
+        if code == END:
+            tok = None
+        else:
+            tok = LexToken()
+            tok.type = lex.tokens[code]
+            tok.value = fastlex.VALUES[code](lexer.lexdata, start, end)
+            tok.lineno = lexer.lineno + lexer.lexdata.count('\n', 0, start)
+            tok.lexpos = start
+            tok.lexer = lexer
+        # The dryck grammars don’t recover from errors, so p_error raises.
+        self.errorfunc(tok)
+        raise SyntaxError(f'Parse error at {tok}')
+
+
+@functools.cache
+def specialize(parser):
+    '''The engine for an LRParser, made once and shared: it keeps no state.'''
+    return Engine(parser)
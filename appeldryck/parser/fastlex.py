@@ -0,0 +1,183 @@
+'''A faster tokenizer for the grammar in lex.py.
+
+PLY’s lexer calls a Python function and makes a LexToken for every token.
+Here the whole text is tokenized up front by one master regular expression
+into three parallel arrays: token type codes, and the start and end offset
+of each token. The rules are taken from lex.py itself, in the same order as
+PLY tries them, so the two tokenizers agree. TokenStream then hands the
+tokens to the parser as LexTokens, making up their values as it goes.'''
+
+from array import array
+import re
+
+from .ply.lex import LexToken
+from . import lex
+
+
+# Token type codes are indices into lex.tokens.
+CODES = {name: code for (code, name) in enumerate(lex.tokens)}
+METATAG = CODES['METATAG']
+METAVAL = CODES['METAVAL']
+METAEOL = CODES['METAEOL']
+FUNC = CODES['FUNC']
+EVAL = CODES['EVAL']
+LBRACE = CODES['LBRACE']
+RBRACE = CODES['RBRACE']
+ARG = CODES['ARG']
+LINK = CODES['LINK']
+LBRACKET = CODES['LBRACKET']
+
+
+def master_re():
+    '''One regex with a named group per rule of the INITIAL state, in order of
+    definition, as PLY does it. The meta and arg states are simple enough to
+    handle by hand.'''
+    rules = [f for (name, f) in vars(lex).items()
+             if name.startswith('t_') and name[2:] in CODES]
+    rules.sort(key=lambda f: f.__code__.co_firstlineno)
+    pattern = '|'.join(f'(?P<{f.__name__[2:]}>{f.__doc__})' for f in rules)
+    regex = re.compile(pattern, re.VERBOSE)
+    # Map the number of each rule’s group, which is the last one
+    # to close when the rule matches, to its token type code.
+    kinds = [None] * (regex.groups + 1)
+    for (name, index) in regex.groupindex.items():
+        kinds[index] = CODES[name]
+    return (regex, kinds)
+
+(MASTER_RE, KINDS) = master_re()
+
+
+def tokenize(lexer):
+    '''Tokenize lexer.lexdata, returning arrays of token types, starts and ends.
+
+    The lexer supplies base, braces and lineno, as with lex.start.'''
+    text = lexer.lexdata
+    types = array('B')
+    starts = array('L')
+    ends = array('L')
+    add_type = types.append
+    add_start = starts.append
+    add_end = ends.append
+    match = MASTER_RE.match
+    kinds = KINDS
+    length = len(text)
+    # What lex.link_end and lex.paren_end have found not to be there.
+    (lexer.nolinks, lexer.noparens) = (0, length)
+    # Line numbers are only needed for error messages, so only
+    # count newlines as far as the last brace we’ve matched.
+    (lineno, counted) = (lexer.lineno, 0)
+    pos = 0
+    while pos < length:
+        m = match(text, pos)
+        if m is None:
+            lineno += text.count('\n', counted, pos)
+            raise Exception(f'Unable to tokenize on line {lineno} at: {text[pos:pos + 20].splitlines()[0]}')
+        code = kinds[m.lastindex]
+        end = m.end()
+        if code == FUNC:
+            if text[end - 1] == '(':
+                # As in lex.t_FUNC.
+                close = lex.paren_end(lexer, pos)
+                (code, end) = (EVAL, pos + 1) if close < 0 else (FUNC, close)
+        elif code == LINK:
+            # As in lex.t_LINK.
+            close = lex.link_end(lexer, pos)
+            (code, end) = (LBRACKET, pos + 1) if close < 0 else (LINK, close)
+        add_type(code)
+        add_start(pos)
+        add_end(end)
+
+        if code == LBRACE:
+            # The whole argument is one token, as with the arg state.
+            lineno += text.count('\n', counted, end)
+            counted = end
+            lexer.lineno = lineno
+            close = lex.match_brace(lexer, end - 1)
+            if close > end:
+                add_type(ARG)
+                add_start(end)
+                add_end(close)
+            add_type(RBRACE)
+            add_start(close)
+            add_end(close + 1)
+            end = close + 1
+
+        elif code == METATAG:
+            # The meta state: the rest of the line and its newline, if any.
+            eol = text.find('\n', end)
+            if eol < 0:
+                eol = length
+            if eol > end:
+                add_type(METAVAL)
+                add_start(end)
+                add_end(eol)
+            end = eol
+            if eol < length:
+                add_type(METAEOL)
+                add_start(eol)
+                add_end(eol + 1)
+                end += 1
+
+        pos = end
+    return (types, starts, ends)
+
+
+def func_value(text, start, end):
+    return lex.func_name(text[start:end])
+
+def metatag_value(text, start, end):
+    return lex.metatag_key(text[start:end])
+
+def link_value(text, start, end):
+    return lex.link_parts(text[start:end])
+
+def text_value(text, start, end):
+    return text[start:end]
+
+VALUES = [text_value] * len(lex.tokens)
+VALUES[FUNC] = func_value
+VALUES[METATAG] = metatag_value
+VALUES[LINK] = link_value
+
+
+class TokenStream:
+    '''Stands in for the PLY lexer as far as the parser is concerned:
+    the grammar rules find the same attributes on it, and it returns
+    the same tokens from token().'''
+
+    def __init__(self):
+        self.args = []
+        self.source = None
+        self.start('')
+
+    def start(self, text, base=0, lineno=1, braces=None):
+        '''As with lex.start, point the stream at a fresh text.'''
+        self.lexdata = text
+        self.base = base
+        self.lineno = lineno
+        self.braces = {} if braces is None else braces
+        # Noted by the parser, for the document.
+        self.breaks = []
+        (self.types, self.starts, self.ends) = tokenize(self)
+        self.lineno = lineno
+        self.lexpos = 0
+        self.index = 0
+
+    def token(self):
+        index = self.index
+        if index == len(self.types):
+            return None
+        self.index = index + 1
+        code = self.types[index]
+        start = self.starts[index]
+        end = self.ends[index]
+        text = self.lexdata
+        tok = LexToken()
+        tok.type = lex.tokens[code]
+        tok.value = VALUES[code](text, start, end)
+        tok.lineno = self.lineno
+        tok.lexpos = start
+        tok.lexer = self
+        self.lineno += text.count('\n', start, end)
+        self.lexpos = end
+        return tok
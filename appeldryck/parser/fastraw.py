@@ -0,0 +1,125 @@
+'''A fast path for parsing in raw mode.
+
+Raw mode is for templates, which are mostly static text that comes out just
+as it went in. The raw grammar still tokenizes every star, bracket, newline
+and paragraph break, only to pass them all through, and makes a Raw block
+for every break. Here we jump from one ◊ to the next with str.find instead,
+and make each stretch of text between them a single Text node, all in one
+Raw block. The output is the same, since every block of a raw document
+begins at the start of a line.
+
+Only what the raw grammar would make of the text is recognized: metadata
+definitions at the top, function calls and evaluations. Links, hard breaks,
+and anything the raw grammar would reject send the text back to the full
+parser, so that it fails in the same way, and they are rare in templates.
+The nodes made here know exactly where they are, so a document parsed this
+way never needs reparsing with tracking.'''
+
+import re
+from types import SimpleNamespace
+
+from . import ast
+from . import lex
+
+
+# The same rules as the lexer’s.
+METATAG_RE = re.compile(lex.t_METATAG.__doc__, re.VERBOSE)
+FUNC_RE = re.compile(lex.t_FUNC.__doc__, re.VERBOSE)
+LBRACE_RE = re.compile(lex.t_LBRACE.__doc__, re.VERBOSE)
+
+# Text that the raw grammar doesn’t simply pass through: a link, a hard break,
+# or a brace where a token begins, which would be taken for an argument.
+# Tokens begin at the start of the text, after a newline, star or bracket,
+# and after the space that ends a bullet or heading marker.
+SPECIAL_RE = re.compile(r'''
+    \[\[
+  | \\\n
+  | (?:^|(?<=[\n*\[])){
+  | (?:^|(?<=\n))(?:\*|\#+)\s+{
+''', re.VERBOSE)
+
+
+def special(text, start, end):
+    '''Whether text[start:end] has anything in it that isn’t just text.'''
+    # Looking for the bits of it that each of its alternatives needs
+    # is much faster than searching with the regex, and usually finds none.
+    for s in ('[[', '\\\n', '{'):
+        if text.find(s, start, end) >= 0:
+            return SPECIAL_RE.search(text, start, end) is not None
+    return False
+
+
+def parse(text, base, source, braces, args):
+    '''Parse text, which begins at offset base of source, as a raw document.
+    The arguments of the functions it calls are added to args.
+    Returns None if the text needs the full parser.'''
+    # A stand-in for the lexer, as far as lex.match_brace is concerned.
+    length = len(text)
+    lexer = SimpleNamespace(lexdata=text, base=base, braces=braces, lineno=0,
+                            noparens=length)
+    calls = []
+
+    # Metadata definitions come first.
+    defs = []
+    pos = 0
+    while (m := METATAG_RE.match(text, pos)):
+        key = lex.metatag_key(m.group())
+        value = m.end()
+        eol = text.find('\n', value)
+        if eol < 0:
+            eol = length
+        if eol == value:
+            return None
+        end = eol if eol < length else value
+        defs.append(ast.Def(base + pos, base + end, key, text[value:eol]))
+        pos = eol + 1 if eol < length else length
+
+    body = pos
+    elements = []
+    try:
+        while True:
+            at = text.find('◊', pos)
+            if at < 0:
+                at = length
+            if special(text, pos, at):
+                return None
+            if at > pos:
+                elements.append(ast.Text(base + pos, base + at, text[pos:at]))
+            if at == length:
+                break
+
+            if (at == 0 or text[at - 1] == '\n') and METATAG_RE.match(text, at):
+                # Definitions don’t belong below the top.
+                return None
+            m = FUNC_RE.match(text, at)
+            pos = m.end() if m else -1
+            if m and text[pos - 1] == '(':
+                # As in lex.t_FUNC.
+                pos = lex.paren_end(lexer, at)
+            if pos >= 0:
+                func = lex.func_name(text[at:pos])
+                end = at
+                call_args = []
+                while (m := LBRACE_RE.match(text, pos)):
+                    close = lex.match_brace(lexer, m.end() - 1)
+                    call_args.append(ast.Arg(base + m.end(), base + close, source))
+                    (pos, end) = (close + 1, close)
+                calls.extend(call_args)
+                elements.append(ast.Apply(base + at, base + end, func, call_args))
+            else:
+                m = LBRACE_RE.match(text, at + 1)
+                if not m:
+                    return None
+                close = lex.match_brace(lexer, m.end() - 1)
+                pos = close + 1
+                if LBRACE_RE.match(text, pos):
+                    # An evaluation takes just the one argument.
+                    return None
+                elements.append(ast.Eval(base + at, base + close, text[m.end():close]))
+    except Exception:
+        # An unclosed brace.
+        return None
+
+    args.extend(calls)
+    block = ast.Raw(base + body, base + length, elements)
+    return ast.Document(base, base + length, defs, [block], source)
@@ -1,4 +1,5 @@
 import re
+import sys
 
 from .ply import lex
 
@@ -20,10 +21,14 @@ states = (('meta', 'exclusive'),
 
 def t_METATAG(t):
     r'(^|(?<=\n))◊\w*:\s*'
+    t.lexer.lineno += t.value.count('\n')
     t.lexer.begin('meta')
-    t.value = re.match(r'◊(\w*):', t.value).group(1)
+    t.value = metatag_key(t.value)
     return t
 
+def metatag_key(value):
+    return re.match(r'◊(\w*):', value).group(1)
+
 def t_meta_METAVAL(t):
     r'[^\n]+'
     return t
@@ -44,24 +49,47 @@ def t_meta_METAEOL(t):
 #
 
 def t_FUNC(t):
-    r'◊(\w+|\([^)]*\))'
-    if t.value.startswith('◊('):
-        t.value = t.value[2:-1]
-    else:
-        t.value = t.value[1:]
+    r'◊(\w+|\()'
+    if t.value.endswith('('):
+        end = paren_end(t.lexer, t.lexpos)
+        if end < 0:
+            # Not a call after all, but a ◊ followed by some text.
+            t.type = 'EVAL'
+            t.value = '◊'
+            t.lexer.lexpos = t.lexpos + 1
+            return t
+        t.value = t.lexer.lexdata[t.lexpos:end]
+        t.lexer.lexpos = end
+        t.lexer.lineno += t.value.count('\n')
+    t.value = func_name(t.value)
     return t
 
+def paren_end(lexer, pos):
+    '''Where the name of the function called by the ◊( at pos ends, just
+    after its ), or -1 if there is no ) to end it. In that case there is none
+    for any later ◊( either, which lexer.noparens remembers, so that a text
+    full of them doesn’t take quadratic time.'''
+    if pos >= lexer.noparens:
+        return -1
+    close = lexer.lexdata.find(')', pos)
+    if close < 0:
+        lexer.noparens = pos
+        return -1
+    return close + 1
+
+def func_name(value):
+    name = value[2:-1] if value.startswith('◊(') else value[1:]
+    # A page calls the same few functions over and over.
+    return sys.intern(name)
+
 def t_EVAL(t):
     r'◊'
     return t
 
 def t_LBRACE(t):
     r'\n?{'
-    t.lexer.push_state('arg')
-    return t
-
-def t_arg_LBRACE(t):
-    r'{'
+    t.lexer.lineno += t.value.count('\n')
+    t.lexer.argend = match_brace(t.lexer, t.lexpos + len(t.value) - 1)
     t.lexer.push_state('arg')
     return t
 
@@ -70,25 +98,77 @@ def t_arg_RBRACE(t):
     t.lexer.pop_state()
     return t
 
+# The whole argument, nested braces and all, up to its closing brace.
+# The parser lexes it again separately if it turns out to be markup.
 def t_arg_ARG(t):
-    r'[^{}]+'
+    r'[^}]'
+    t.value = t.lexer.lexdata[t.lexpos:t.lexer.argend]
+    t.lexer.lexpos = t.lexer.argend
     t.lexer.lineno += t.value.count('\n')
     return t
 
 
+BRACE_RE = re.compile(r'[{}]')
+
+def match_brace(lexer, pos):
+    '''Returns the position of the brace that closes the one at pos.
+
+    Every match found along the way is remembered in lexer.braces, keyed by
+    position in the whole source, so that when the arguments are lexed in turn
+    their own braces don’t have to be scanned again.'''
+    base = lexer.base
+    close = lexer.braces.get(base + pos)
+    if close is None:
+        stack = []
+        for m in BRACE_RE.finditer(lexer.lexdata, pos):
+            if m.group() == '{':
+                stack.append(m.start())
+            else:
+                lexer.braces[base + stack.pop()] = base + m.start()
+                if not stack:
+                    break
+        else:
+            raise Exception(f'Unclosed brace on line {lexer.lineno}')
+        close = lexer.braces[base + pos]
+    return close - base
+
+
 #
 # Links.
 #
 
 def t_LINK(t):
-    r'\[\[.*?\]\](?!])'
-    parsed = re.match(r'\[\[(.+?)(\|(.*))?]]', t.value)
-    (dest, label) = parsed.group(1, 3)
-    if not label:
-        label = dest
-    t.value = (dest, label)
+    r'\[\['
+    end = link_end(t.lexer, t.lexpos)
+    if end < 0:
+        # Not a link after all, just a bracket.
+        t.type = 'LBRACKET'
+        t.value = '['
+        t.lexer.lexpos = t.lexpos + 1
+        return t
+    t.value = link_parts(t.lexer.lexdata[t.lexpos:end])
+    t.lexer.lexpos = end
     return t
 
+LINK_RE = re.compile(r'\[\[.*?\]\](?!])')
+
+def link_end(lexer, pos):
+    '''Where the link beginning at pos ends, or -1 if it isn’t closed on its
+    line. In that case no later link on the line is closed either, which
+    lexer.nolinks remembers, so that a line full of [[ doesn’t take quadratic time.'''
+    if pos < lexer.nolinks:
+        return -1
+    m = LINK_RE.match(lexer.lexdata, pos)
+    if m is None:
+        eol = lexer.lexdata.find('\n', pos)
+        lexer.nolinks = eol if eol >= 0 else len(lexer.lexdata)
+        return -1
+    return m.end()
+
+def link_parts(value):
+    '''The destination of a link, and its label or None.'''
+    return re.match(r'\[\[(.+?)(\|(.*))?]]', value).group(1, 3)
+
 
 #
 # Itemized lists.
@@ -96,6 +176,7 @@ def t_LINK(t):
 
 def t_BULLET(t):
     r'(^|(?<=\n))\*\s+'
+    t.lexer.lineno += t.value.count('\n')
     return t
 
 
@@ -105,6 +186,7 @@ def t_BULLET(t):
 
 def t_OCTOTHORPE(t):
     r'(^|(?<=\n))\#+\s+'
+    t.lexer.lineno += t.value.count('\n')
     return t
 
 
@@ -154,4 +236,25 @@ def t_error(t):
     raise Exception(f'Unable to tokenize on line {t.lexer.lineno} at: {t.value[:20].splitlines()[0]}')
 
 
-lexer = lex.lex()
+
+def start(lexer, text, base=0, lineno=1, braces=None):
+    '''Point the lexer at a fresh text, which begins at offset base and line
+    lineno of the source document it was taken from. Texts taken from the same
+    source should share their braces.'''
+    lexer.input(text)
+    lexer.lexstatestack = []
+    lexer.begin('INITIAL')
+    lexer.lineno = lineno
+    lexer.base = base
+    lexer.braces = {} if braces is None else braces
+    (lexer.nolinks, lexer.noparens) = (0, len(text))
+
+
+def __getattr__(name):
+    # Build the lexer the first time somebody asks for it,
+    # so that merely importing dryck doesn’t pay for it.
+    if name == 'lexer':
+        global lexer
+        lexer = lex.lex(module=sys.modules[__name__])
+        return lexer
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,4 +1,7 @@
+import sys
+
 from .baseparse import *
+from ..cache import cache_dir
 
 
 #
@@ -7,19 +10,21 @@ from .baseparse import *
 
 def p_block_itemized(p):
     'block : items'
-    p[0] = ast.Itemized(p.linespan(0), p.lexspan(0), p[1], ordered=False)
+    p[0] = ast.Itemized(*locate(p), list(p[1]), ordered=False)
 
+@prepends
 def p_items_list(p):
     'items : item items'
-    p[0] = [p[1]] + p[2]
+    p[2].appendleft(p[1])
+    p[0] = p[2]
 
 def p_items_base(p):
     'items : item'
-    p[0] = [p[1]]
+    p[0] = deque([p[1]])
 
 def p_item(p):
     'item : BULLET elements'
-    p[0] = ast.Item(p.linespan(0), p.lexspan(0), p[2])
+    p[0] = ast.Item(*locate(p), list(p[2]))
 
 
 #
@@ -28,23 +33,26 @@ def p_item(p):
 
 def p_block_heading(p):
     'block : OCTOTHORPE elements'
-    p[0] = ast.Heading(p.linespan(0), p.lexspan(0), p[2], p[1].count('#'))
+    p[0] = ast.Heading(*locate(p), list(p[2]), p[1].count('#'))
 
 
 #
 # Text elements.
 #
 
+@trivial
 def p_element(p):
     '''element : starfield
                | starred'''
     p[0] = p[1]
 
+@prepends
 def p_spans_text(p):
     '''spans : TEXT spans
              | LBRACKET spans
              | NEWLINE spans'''
-    p[0] = p[1] + p[2]
+    p[2].appendleft(p[1])
+    p[0] = p[2]
 
 
 #
@@ -53,17 +61,30 @@ def p_spans_text(p):
 
 def p_starred(p):
     'starred : STAR starfields STAR'
-    p[0] = [ast.Star(p.linespan(0), p.lexspan(0), p[2])]
+    p[0] = [ast.Star(*locate(p), list(p[2]))]
 
 def p_starfields_list(p):
     'starfields : starfield starfields'
-    p[0] = p[1] + p[2]
+    p[2].extendleft(reversed(p[1]))
+    p[0] = p[2]
 
 def p_starfields_base(p):
     'starfields : starfield'
-    p[0] = p[1]
+    p[0] = deque(p[1])
 
 
 start = 'document'
-parser = yacc.yacc()
-parser.raw = False
+
+# Stars and bullets are markup here, not text.
+punctuation = punctuation | {'STAR', 'BULLET'}
+
+
+def __getattr__(name):
+    # Build the parser the first time somebody asks for it.
+    if name == 'parser':
+        global parser
+        parser = yacc.yacc(module=sys.modules[__name__], cachedir=cache_dir('tables'))
+        parser.raw = False
+        parser.punctuation = punctuation
+        return parser
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
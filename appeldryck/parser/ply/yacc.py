@@ -61,10 +61,14 @@
 # own risk!
 # ----------------------------------------------------------------------------
 
+from array import array
 import re
 import types
 import sys
 import inspect
+import hashlib
+import os
+import pickle
 
 #-----------------------------------------------------------------------------
 #                     === User configurable parameters ===
@@ -78,6 +82,8 @@ yaccdebug   = False            # Debugging mode.  If set, yacc generates a
 debug_file  = 'parser.out'     # Default name of the debugging file
 error_count = 3                # Number of symbols that must be shifted to leave recovery mode
 resultlimit = 40               # Size limit of results when running in debug mode.
+tabversion  = 1                # Version of the cached table format. Bump this to
+                               # invalidate every table written by an older yacc.
 
 MAXINT = sys.maxsize
 
@@ -218,6 +224,94 @@ class YaccProduction:
     def error(self):
         raise SyntaxError
 
+# -----------------------------------------------------------------------------
+#                            == CompactTables ==
+#
+# The action and goto tables, kept in two flat arrays of machine ints instead of
+# dicts of dicts: a row for each state, indexed by terminal code for actions and
+# by nonterminal number for gotos, so that the rows are as wide as the larger of
+# the two.  Terminals are numbered in the order of the grammar's tokens, with
+# $end after them.  A state is known by the offset of its row, so shifts and
+# gotos hold the offset of the row of the state they go to.  Reductions are
+# negative and accepting is zero, as in PLY's own tables.
+#
+# A defaulted state, which reduces by the same rule whatever comes next, has
+# that reduction all along its row.  LRParser reduces in such a state without
+# looking at its row at all, and a parser that has already read its tokens can
+# use the row as it is.
+#
+# Reading an array doesn't write to it, as reading a list or dict writes to
+# the reference counts of its items, so forked processes go on sharing the
+# parent's copy.
+# -----------------------------------------------------------------------------
+
+ERROR = -2**31                 # An action or goto that the grammar doesn't allow
+
+class CompactTables:
+    def __init__(self, action, goto, terminals, productions):
+        codes = {name: code for (code, name) in enumerate(terminals)}
+        codes['$end'] = len(codes)
+        for actions in action.values():
+            for name in actions:
+                if name not in codes:
+                    codes[name] = len(codes)
+        nonterminals = sorted({p.name for p in productions})
+        self.codes = codes
+        self.nonterminals = {name: n for (n, name) in enumerate(nonterminals)}
+        self.width = width = max(len(codes), len(nonterminals))
+        self.states = states = len(action)
+
+        self.defaulted_states = {}
+        self.action = array('i', [ERROR]) * (states * width)
+        self.goto = array('i', [ERROR]) * (states * width)
+        for (state, actions) in action.items():
+            row = state * width
+            rules = list(actions.values())
+            if len(rules) == 1 and rules[0] < 0:
+                self.defaulted_states[state] = rules[0]
+                self.action[row:row + len(codes)] = array('i', rules) * len(codes)
+                continue
+            for (name, t) in actions.items():
+                self.action[row + codes[name]] = t * width if t > 0 else t
+        for (state, gotos) in goto.items():
+            for (name, target) in gotos.items():
+                self.goto[state * width + self.nonterminals[name]] = target * width
+
+# What LRParser sees of the tables: for each state, a row that is a dict like
+# those of PLY's own tables, so that looking things up in it costs no more.
+# A row is made from the arrays the first time it is asked for, so a process
+# that never tracks positions or debugs, and so never uses LRParser, has none.
+
+class ActionTable(dict):
+    def __init__(self, tables):
+        self.tables = tables
+
+    def __missing__(self, state):
+        tables = self.tables
+        row = state * tables.width
+        actions = {}
+        for (name, code) in tables.codes.items():
+            t = tables.action[row + code]
+            if t != ERROR:
+                actions[name] = t // tables.width if t > 0 else t
+        self[state] = actions
+        return actions
+
+class GotoTable(dict):
+    def __init__(self, tables):
+        self.tables = tables
+
+    def __missing__(self, state):
+        tables = self.tables
+        row = state * tables.width
+        gotos = {}
+        for (name, n) in tables.nonterminals.items():
+            target = tables.goto[row + n]
+            if target != ERROR:
+                gotos[name] = target // tables.width
+        self[state] = gotos
+        return gotos
+
 # -----------------------------------------------------------------------------
 #                               == LRParser ==
 #
@@ -225,10 +319,11 @@ class YaccProduction:
 # -----------------------------------------------------------------------------
 
 class LRParser:
-    def __init__(self, lrtab, errorf):
+    def __init__(self, lrtab, errorf, terminals=()):
         self.productions = lrtab.lr_productions
-        self.action = lrtab.lr_action
-        self.goto = lrtab.lr_goto
+        self.tables = CompactTables(lrtab.lr_action, lrtab.lr_goto, terminals, lrtab.lr_productions)
+        self.action = ActionTable(self.tables)
+        self.goto = GotoTable(self.tables)
         self.errorfunc = errorf
         self.set_defaulted_states()
         self.errorok = True
@@ -253,11 +348,7 @@ class LRParser:
     #
     # See:  http://www.gnu.org/software/bison/manual/html_node/Default-Reductions.html#Default-Reductions
     def set_defaulted_states(self):
-        self.defaulted_states = {}
-        for state, actions in self.action.items():
-            rules = list(actions.values())
-            if len(rules) == 1 and rules[0] < 0:
-                self.defaulted_states[state] = rules[0]
+        self.defaulted_states = dict(self.tables.defaulted_states)
 
     def disable_defaulted_states(self):
         self.defaulted_states = {}
@@ -1929,6 +2020,84 @@ class LRTable:
 # introspection features followed by the yacc() function itself.
 # -----------------------------------------------------------------------------
 
+# -----------------------------------------------------------------------------
+#                          === Table Caching ===
+#
+# Building the LR tables is by far the most expensive part of yacc().  The
+# tables depend only on the grammar, so they can be pickled to a cache
+# directory and loaded on the next run.  Cached tables are stored under a hash
+# of the grammar signature, so editing any rule docstring or the token list
+# simply causes a new table to be built and written alongside the old one.
+# -----------------------------------------------------------------------------
+
+# A stripped-down Production carrying just what the LRParser needs at runtime.
+class MiniProduction(object):
+    def __init__(self, str, name, len, func, file, line):
+        self.name     = name
+        self.len      = len
+        self.func     = func
+        self.callable = None
+        self.file     = file
+        self.line     = line
+        self.str      = str
+
+    def __str__(self):
+        return self.str
+
+    def __repr__(self):
+        return 'MiniProduction(%s)' % self.str
+
+    # Bind the production function name to a callable
+    def bind(self, pdict):
+        if self.func:
+            self.callable = pdict[self.func]
+
+# The subset of LRTable that LRParser consumes, as read back from the cache.
+class CachedLRTable(object):
+    def __init__(self, action, goto, productions):
+        self.lr_action      = action
+        self.lr_goto        = goto
+        self.lr_productions = productions
+
+    def bind_callables(self, pdict):
+        for p in self.lr_productions:
+            p.bind(pdict)
+
+def table_signature(pinfo):
+    # The grammar signature covers the start symbol, precedence, tokens and
+    # rule docstrings.  Add the rule function names, since those are what the
+    # cached productions bind to.
+    parts = [str(tabversion), pinfo.signature()]
+    parts.extend(f[2] for f in pinfo.pfuncs)
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+def read_tables(filename):
+    try:
+        with open(filename, 'rb') as f:
+            data = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('tabversion') != tabversion:
+        return None
+    productions = [MiniProduction(*p) for p in data['productions']]
+    return CachedLRTable(data['action'], data['goto'], productions)
+
+def write_tables(lr, filename):
+    data = {
+        'tabversion': tabversion,
+        'action': lr.lr_action,
+        'goto': lr.lr_goto,
+        'productions': [(p.str, p.name, p.len, p.func, os.path.basename(p.file), p.line)
+                        for p in lr.lr_productions],
+    }
+    # Write to a temporary file and move it into place, so that concurrent
+    # processes never observe a partially written table.
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmpname = '%s.%d.tmp' % (filename, os.getpid())
+    with open(tmpname, 'wb') as f:
+        pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpname, filename)
+
 # -----------------------------------------------------------------------------
 # get_caller_module_dict()
 #
@@ -2270,7 +2439,7 @@ class ParserReflect(object):
 
 def yacc(*, debug=yaccdebug, module=None, start=None,
          check_recursion=True, optimize=False, debugfile=debug_file,
-         debuglog=None, errorlog=None):
+         debuglog=None, errorlog=None, cachedir=None):
 
     # Reference to the parsing method of the last built parser
     global parse
@@ -2303,6 +2472,18 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
     if pinfo.error:
         raise YaccError('Unable to build parser')
 
+    # If tables for this exact grammar have been cached, skip straight to
+    # building the parser.  The grammar was validated when they were written.
+    tabfile = None
+    if cachedir and not debug:
+        tabfile = os.path.join(cachedir, table_signature(pinfo) + '.tables')
+        lr = read_tables(tabfile)
+        if lr:
+            lr.bind_callables(pinfo.pdict)
+            parser = LRParser(lr, pinfo.error_func, pinfo.pdict['tokens'])
+            parse = parser.parse
+            return parser
+
     if debuglog is None:
         if debug:
             try:
@@ -2474,9 +2655,16 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
                 errorlog.warning('Rule (%s) is never reduced', rejected)
                 warned_never.append(rejected)
 
+    # Cache the tables for next time
+    if tabfile:
+        try:
+            write_tables(lr, tabfile)
+        except OSError as e:
+            errorlog.warning("Couldn't write tables to %r. %s", tabfile, e)
+
     # Build the parser
     lr.bind_callables(pinfo.pdict)
-    parser = LRParser(lr, pinfo.error_func)
+    parser = LRParser(lr, pinfo.error_func, pinfo.pdict['tokens'])
 
     parse = parser.parse
     return parser
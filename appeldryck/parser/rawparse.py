@@ -1,10 +1,15 @@
+import sys
+
 from .baseparse import *
+from ..cache import cache_dir
 
 
+@trivial
 def p_element(p):
     '''element : starfield'''
     p[0] = p[1]
 
+@prepends
 def p_spans_text(p):
     '''spans : TEXT spans
              | LBRACKET spans
@@ -13,10 +18,20 @@ def p_spans_text(p):
              | BULLET spans
              | OCTOTHORPE spans
              | STAR spans'''
-    p[0] = p[1] + p[2]
+    p[2].appendleft(p[1])
+    p[0] = p[2]
 
 
 
 start = 'document'
-raw_parser = yacc.yacc()
-raw_parser.raw = True
+
+
+def __getattr__(name):
+    # Build the parser the first time somebody asks for it.
+    if name == 'raw_parser':
+        global raw_parser
+        raw_parser = yacc.yacc(module=sys.modules[__name__], cachedir=cache_dir('tables'))
+        raw_parser.raw = True
+        raw_parser.punctuation = punctuation
+        return raw_parser
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,282 @@
+import bisect
+import collections
+import contextlib
+import copy
+
+from . import ast
+from . import engine
+from . import fastlex
+from . import fastraw
+from .ply.lex import LexToken
+
+
+class ParserSession:
+    '''A private lexer and pair of parsers for parsing one document at a time.
+
+    The LR parsers keep their state on the instance, so sharing the
+    module-level ones between threads (or between a parse and a nested one)
+    is unsafe. A session copies them. The LR tables are shared, not copied.
+    Rather than PLY’s lexer, the parsers read from a fastlex.TokenStream,
+    and unless we’re tracking positions or debugging, an engine.Engine
+    stands in for PLY’s parser. Raw documents take fastraw’s fast path
+    where they can.'''
+
+    def __init__(self):
+        from .parse import parser
+        from .rawparse import raw_parser
+        self.lexer = fastlex.TokenStream()
+        self.parsers = {False: copy.copy(parser), True: copy.copy(raw_parser)}
+        self.engines = {False: engine.specialize(parser), True: engine.specialize(raw_parser)}
+
+    def parse(self, text, raw=False, tracking=False, debug=False, lineno=1):
+        '''Parse a document, and the arguments of the functions it calls.
+        A document can be part of a bigger one, starting on line lineno.'''
+        lexer = self.lexer
+        lexer.source = ast.Source(text, lineno)
+        lexer.args = []
+        doc = self.read(text, 0, lineno, None, raw, tracking, debug)
+        self.parse_args(raw, tracking, debug)
+        return doc
+
+    def stream(self, pieces, raw=False):
+        '''Parse a document whose text comes in pieces, such as the lines of
+        a file, a few blocks at a time. Yields a document for each run of
+        blocks as soon as they are complete, each with a source of its own,
+        and only the first with the metadata definitions. Raw documents,
+        which don’t break into blocks, are parsed whole.
+
+        We can’t be sure that a break ends a block until we’ve parsed
+        up to it, so the text read so far is parsed up to its last break,
+        and if that fails or the break doesn’t divide blocks, we wait until
+        we’ve read twice as much and try again.'''
+        if raw:
+            yield self.parse(''.join(pieces), raw=True)
+            return
+        pending = []
+        size = 0
+        wanted = STREAM_CHUNK
+        (offset, lineno) = (0, 1)
+        for piece in pieces:
+            pending.append(piece)
+            size += len(piece)
+            if size < wanted:
+                continue
+            text = ''.join(pending)
+            doc = self.parse_blocks(text, lineno)
+            if doc is None:
+                pending = [text]
+                wanted = max(2 * size, size + STREAM_CHUNK)
+                continue
+            yield check_defs(doc, offset)
+            offset += doc.end
+            lineno += text.count('\n', 0, doc.end)
+            pending = [text[doc.end:]]
+            size = len(pending[0])
+            wanted = size + STREAM_CHUNK
+        yield check_defs(self.parse(''.join(pending), lineno=lineno), offset)
+
+    def parse_blocks(self, text, lineno):
+        '''Parse text, beginning on line lineno, up to its last break between
+        blocks. Returns None if there isn’t one, as far as we can tell.'''
+        # We need to see where a break ends, so it can’t end the text.
+        limit = len(text)
+        while limit and text[limit - 1] == '\n':
+            limit -= 1
+        pos = text.rfind('\n\n', 0, limit)
+        if pos < 0:
+            return None
+        while pos and text[pos - 1] == '\n':
+            pos -= 1
+        end = break_end(text, pos)
+        try:
+            doc = self.parse(text[:end], lineno=lineno)
+        except Exception:
+            return None
+        if doc.breaks[-1:] != (pos,):
+            return None
+        # The break was followed by an empty block, which isn’t ours.
+        del doc.text[-1]
+        doc.breaks = doc.breaks[:-1]
+        return doc
+
+    def parse_args(self, raw=False, tracking=False, debug=False):
+        '''Parse the arguments in lexer.args, and the arguments in them.'''
+        # Work through the arguments with a list rather than by recursion,
+        # so that deeply nested calls don’t blow the stack.
+        lexer = self.lexer
+        braces = lexer.braces
+        while lexer.args:
+            arg = lexer.args.pop()
+            try:
+                arg.doc = self.parse_arg(arg, raw, tracking, debug, braces)
+            except Exception:
+                # Not every argument is markup. The arguments of @raw and @pyargs
+                # functions needn’t be, so leave it to the evaluator to complain.
+                arg.doc = None
+
+    def update(self, doc, text, raw=False):
+        '''Parse text, an edited version of doc’s, parsing again only the blocks
+        that the edit touched. The rest are taken from doc, which is used up:
+        its nodes move to the new document, and its source changes.
+
+        An edit can’t be trusted to leave the blocks around it alone unless
+        the breaks between them are untouched, so we reparse from the last
+        break before the edit to the first one after it. Raw documents,
+        which are parsed quickly anyway, are parsed afresh.'''
+        old = doc.source.text
+        breaks = doc.breaks
+        if raw or (doc.start, doc.end) != (0, len(old)) or len(doc.text) != len(breaks) + 1:
+            return self.parse(text, raw)
+
+        prefix = common_prefix(old, text)
+        suffix = common_suffix(old, text, min(len(old), len(text)) - prefix)
+        delta = len(text) - len(old)
+
+        # The blocks before break i are kept, if the break, and the character
+        # after it that ends it, come before the edit.
+        i = bisect.bisect_left(breaks, prefix)
+        if i > 0 and break_end(old, breaks[i - 1]) >= prefix:
+            i -= 1
+        start = break_end(old, breaks[i - 1]) if i > 0 else 0
+        # And the blocks after break k, if it comes after the edit.
+        k = bisect.bisect_left(breaks, len(old) - suffix)
+        if k < len(breaks):
+            # Parse up to and including the break, to be sure that
+            # the edit hasn’t run on into it.
+            end = break_end(old, breaks[k]) + delta
+        else:
+            end = len(text)
+
+        lexer = self.lexer
+        lexer.source = doc.source
+        lexer.source.replace(text, prefix, suffix)
+        lexer.args = []
+        try:
+            part = self.read(text[start:end], start, lexer.source.line(start), None)
+            self.parse_args()
+        except Exception:
+            part = None
+        if part is not None and k < len(breaks):
+            if part.breaks[-1:] != (breaks[k] + delta,):
+                part = None
+            else:
+                # The break was followed by an empty block, which isn’t ours.
+                del part.text[-1]
+                part.breaks = part.breaks[:-1]
+        if part is None or (i > 0 and part.metatext):
+            # Whatever the edit did, it reached beyond the blocks we
+            # reparsed, or it needs the whole document to explain it.
+            return self.parse(text)
+
+        kept = doc.text[k + 1:]
+        if delta:
+            for block in kept:
+                ast.shift(block, delta)
+        return ast.Document(
+            0, len(text),
+            part.metatext if i == 0 else doc.metatext,
+            doc.text[:i] + part.text + kept,
+            lexer.source,
+            breaks[:i] + part.breaks + tuple(pos + delta for pos in breaks[k:]))
+
+    def parse_arg(self, arg, raw=False, tracking=False, debug=False, braces=None):
+        '''Parse the text of a function argument, leaving the arguments
+        of any functions it calls in lexer.args.'''
+        lexer = self.lexer
+        lexer.source = arg.source
+        return self.read(arg.text, arg.start, arg.source.line(arg.start), braces, raw, tracking, debug)
+
+    def reparse(self, doc, raw=False):
+        '''Parse the text of a document again, tracking positions, so that all
+        its nodes have accurate spans. The function arguments are left unparsed.'''
+        lexer = self.lexer
+        lexer.source = doc.source
+        text = doc.source.text[doc.start:doc.end]
+        tracked = self.read(text, doc.start, doc.source.line(doc.start), None, raw, tracking=True)
+        lexer.args = []
+        return tracked
+
+    def read(self, text, base, lineno, braces, raw=False, tracking=False, debug=False):
+        '''Parse text, which begins at offset base and line lineno of the source.'''
+        lexer = self.lexer
+        if raw and not debug:
+            # The fast path’s nodes are always where they say they are,
+            # so it will do for tracking too.
+            if braces is None:
+                braces = {}
+            doc = fastraw.parse(text, base, lexer.source, braces, lexer.args)
+            if doc is not None:
+                lexer.braces = braces
+                return doc
+        lexer.start(text, base, lineno, braces)
+        return self.run(raw, tracking, debug)
+
+    def run(self, raw=False, tracking=False, debug=False):
+        '''Parse what the lexer has been started on.'''
+        if tracking or debug:
+            return self.parsers[raw].parse(lexer=self.lexer, tracking=tracking, debug=debug)
+        return self.engines[raw].parse(self.lexer)
+
+
+def check_defs(doc, offset):
+    '''Complains if doc, the part of a streamed document that begins at
+    offset, has metadata definitions but isn’t the first part. Definitions
+    don’t belong below the top, so parsing the whole text would have failed.'''
+    if offset and doc.metatext:
+        lineno = doc.source.lineno
+        tok = LexToken()
+        (tok.type, tok.value, tok.lineno, tok.lexpos) = ('METATAG', doc.metatext[0].key, lineno, offset)
+        raise Exception(f'Parse error on line {lineno}: {tok}')
+    return doc
+
+
+# How much of a streamed document to read before trying to parse some blocks.
+STREAM_CHUNK = 1 << 16
+
+
+def common_prefix(a, b):
+    '''The length of the longest common prefix of a and b.'''
+    # Compare slices, so that the comparing is done in C, a block
+    # at a time, and only go character by character in the last one.
+    (n, limit, step) = (0, min(len(a), len(b)), 4096)
+    while n + step <= limit and a[n:n + step] == b[n:n + step]:
+        n += step
+    while n < limit and a[n] == b[n]:
+        n += 1
+    return n
+
+
+def common_suffix(a, b, limit):
+    '''The length of the longest common suffix of a and b, up to limit.'''
+    (n, step) = (0, 4096)
+    (la, lb) = (len(a), len(b))
+    while n + step <= limit and a[la - n - step:la - n] == b[lb - n - step:lb - n]:
+        n += step
+    while n < limit and a[la - n - 1] == b[lb - n - 1]:
+        n += 1
+    return n
+
+
+def break_end(text, pos):
+    '''Where the break beginning at pos ends.'''
+    end = pos
+    while end < len(text) and text[end] == '\n':
+        end += 1
+    return end
+
+
+# Idle sessions, ready for reuse. Deque appends and pops are thread-safe.
+_pool = collections.deque()
+
+
+@contextlib.contextmanager
+def acquire():
+    '''Check out a parser session for the duration of a with block.'''
+    try:
+        session = _pool.pop()
+    except IndexError:
+        session = ParserSession()
+    try:
+        yield session
+    finally:
+        _pool.append(session)
@@ -1,25 +1,113 @@
+from dataclasses import fields
 import importlib
 import pprint
+import random
 import sys
 
-from .lex import lexer
-from .parse import parser
+from . import ast
+from . import fastlex
+from . import lex as lexmod
+from . import session
 
 def lex(text):
     reload()
-    lexer.input(text)
+    lexer = lexmod.lexer
+    lexmod.start(lexer, text)
     while True:
         t = lexer.token()
         if not t:
             break
         print(t)
 
+def difflex(text):
+    '''Tokenize text, and the arguments in it, with both PLY’s lexer and
+    fastlex. Returns the first pair of tokens that differ, or None.'''
+    ply = lexmod.lexer.clone()
+    fast = fastlex.TokenStream()
+    braces = {}
+    texts = [(text, 0, 1)]
+    while texts:
+        (text, base, lineno) = texts.pop()
+        lexmod.start(ply, text, base, lineno, braces)
+        fast.start(text, base, lineno, braces)
+        while True:
+            (a, b) = (ply.token(), fast.token())
+            # The parser also looks at where the lexer has got to.
+            key_a = a and (a.type, a.value, a.lineno, a.lexpos, ply.lineno, ply.lexpos)
+            key_b = b and (b.type, b.value, b.lineno, b.lexpos, fast.lineno, fast.lexpos)
+            if key_a != key_b:
+                return (a, b)
+            if not a:
+                break
+            if a.type == 'ARG':
+                texts.append((a.value, base + a.lexpos, a.lineno))
+
+def diffupdate(old, new):
+    '''Parse old, then update the document to new incrementally, and parse new
+    afresh. Returns the two documents if they differ, or None.'''
+    with session.acquire() as s:
+        full = s.parse(new)
+        updated = s.update(s.parse(old), new)
+    if promised(full) != promised(updated) or full.breaks != updated.breaks:
+        return (full, updated)
+
+def promised(node):
+    '''What the parser promises about a document parsed without tracking:
+    everything but the spans of nodes other than arguments and documents.'''
+    if isinstance(node, list):
+        return [promised(n) for n in node]
+    if not isinstance(node, ast.Node):
+        return node
+    reliable = isinstance(node, (ast.Arg, ast.Document))
+    return (type(node).__name__,
+            *[promised(getattr(node, f.name)) for f in fields(node)
+              if f.compare and (reliable or f.name not in ('start', 'end'))])
+
+# The pieces that generated documents are made of: every kind of markup,
+# and the characters that lexing and block breaks hinge on.
+FRAGMENTS = [
+    'word', 'two words', 'Ünïcode – text’s', '  ', '\n', '\n\n', '\n\n\n',
+    '*emphasis*', '**strong**', '* item', '\n* item\n* item\n', '# Heading\n',
+    '◊f', '◊f{arg}', '◊f{a}{b}', '◊f{◊g{nested}}', '◊f{with {braces}}',
+    '◊f{a}\n{on a new line}', '◊(f){call}', '◊(f)', '◊{1 + 1}', '◊{x}',
+    '[[Link]]', '[[Link|label]]', '[text](url.html)', '[brackets]', '[', ']',
+    '\\\n', '\\', '|',
+]
+# Pieces that often leave a document that doesn’t parse, so they come up less.
+ODD = ['{', '}', 'a◊', '◊◊', '◊f{unclosed']
+HEADERS = ['', '◊title: A page\n', '◊title: A page\n◊author\n\n']
+
+
+def document(rand):
+    '''A random document, which may or may not parse.'''
+    pieces = [rand.choice(HEADERS)]
+    for _ in range(rand.randrange(1, 60)):
+        pieces.append(rand.choice(ODD if rand.random() < 0.02 else FRAGMENTS))
+        pieces.append(rand.choice(' \n'))
+    return ''.join(pieces)
+
+
+def corpus(count, seed=0):
+    '''count random documents, the same ones for the same seed.'''
+    rand = random.Random(seed)
+    return [document(rand) for _ in range(count)]
+
+
+def edit(rand, text):
+    '''text, with a random piece cut out, or a random fragment put in.'''
+    start = rand.randrange(len(text) + 1)
+    if rand.random() < 0.5:
+        end = min(len(text), start + rand.randrange(1, 20))
+        return text[:start] + text[end:]
+    return text[:start] + rand.choice(FRAGMENTS) + text[start:]
+
 def parse(text):
     reload()
     parse_internal(text)
 
 def parse_internal(text):
-    p = parser.parse(text)
+    with session.acquire() as s:
+        p = s.parse(text)
     pprint.pp(p)
 
 def reload():
@@ -2,75 +2,97 @@ import os
 from pathlib import Path
 import sys
 
+from . import concurrency
 from . import context
 from . import evaluator
+from . import output
 
 
-def _render_file(env, filename, raw):
+def _render_file(env, filename, raw, out=None):
     if not isinstance(filename, Path):
         filename = Path(filename)
     raw_text = filename.read_text()
-    return _render_string(env, raw_text, raw, filename)
+    return _render_string(env, raw_text, raw, filename, out)
 
 
-def _render_string(env, raw_text, raw, filename):
+def _render_string(env, raw_text, raw, filename, out=None):
     try:
         if hasattr(env, 'replace'):
             for (old, new) in env.replace.items():
                 raw_text = raw_text.replace(old, new)
 
+        doc = evaluator.parse_page(raw_text, raw, persist=True)
+        if out is not None:
+            # Write the page markup to out as it is evaluated.
+            evaluator.eval_doc(doc, env, raw, name=filename, out=out)
+            return out
         # Evaluate the page markup and put it in the context.
-        env.body = evaluator.eval_page(raw_text, env, raw, name=filename)
+        env.body = evaluator.eval_doc(doc, env, raw, name=filename)
         return env.body
     except evaluator.SuppressPageGenerationException:
         # The page can cancel its own production.
         return None
 
 
-def markup(env, filename):
-    '''Run the given file in page mode.'''
+def markup(env, filename, out=None):
+    '''Run the given file in page mode. If out is given, the markup is
+    written to that sink instead of being put in env.body and returned.'''
     try:
-        return _render_file(env, filename, False)
+        return _render_file(env, filename, False, out)
     except evaluator.DryckException as e:
         # Suppress callstack for parser internals.
         raise evaluator.DryckException(e) from e.__cause__
 
 
-def preprocess(env, filename):
-    '''Run the given file in preprocessor mode.'''
+def preprocess(env, filename, out=None):
+    '''Run the given file in preprocessor mode. If out is given, the output is
+    written to that sink instead of being put in env.body and returned.'''
     # If we were passed a dict, it's safe to assume we wanted a generic
     # Context object, since we're in preprocessor mode.
     if type(env) is dict:
         ctx = context.Context()
         ctx.__dict__ |= env
+        context.changed()
         env = ctx
     try:
-        return _render_file(env, filename, True)
+        return _render_file(env, filename, True, out)
     except evaluator.DryckException as e:
         # Suppress callstack for parser internals.
         raise evaluator.DryckException(e) from e.__cause__
 
 
-def render(env, page_filename, template_filename=[], out_filename=None):
+def render(env, page_filename, template_filename=[], out_filename=None, out=None):
     '''Easy mode: Run the given file in page mode, injecting the result into each of the
     supplied templates, turduckenwise. Snarf up the global namespace into the context,
-    and allow specifying an output filename for convenience.'''
+    and allow specifying an output filename for convenience.
+
+    If out is given, the last of these is written to that sink as it is rendered,
+    instead of being put in env.body and returned, and out is returned in its
+    place. out_filename is only written if out isn’t given.'''
     try:
         # Add the global dict to the context, to keep simple projects simple.
         env.__dict__.update(sys.modules['__main__'].__dict__)
+        context.changed()
+
+        if not isinstance(template_filename, list):
+            template_filename = [template_filename]
 
         if page_filename:
             # Add the page filename to the context.
             env.filename = os.path.splitext(page_filename)[0]
 
-            if markup(env, page_filename) == None:
+            # Only the last stage is written to out.
+            page_out = None if template_filename else out
+            if markup(env, page_filename, page_out) == None:
                 return
 
-        if not isinstance(template_filename, list):
-            template_filename = [template_filename]
+        for (i, f) in enumerate(template_filename):
+            template_out = out if i == len(template_filename) - 1 else None
+            if preprocess(env, f, template_out) == None and template_out is not None:
+                return
 
-        for f in template_filename:
-            preprocess(env, f)
+        if out is not None:
+            return out
 
         if out_filename:
             Path(out_filename).write_text(env.body)
@@ -79,3 +101,27 @@ def render(env, page_filename, template_filename=[], out_filename=None):
     except evaluator.DryckException as e:
         # Suppress callstack for parser internals.
         raise evaluator.DryckException(e) from e.__cause__
+
+
+async def preprocess_async(env, filename):
+    '''Run the given file in preprocessor mode, as preprocess does, running the
+    async dryck functions it calls concurrently, and return the output.'''
+    body = await concurrency.gather(preprocess, env, filename)
+    if body is not None and type(env) is not dict:
+        env.body = body
+    return body
+
+
+async def render_async(env, page_filename, template_filename=[], out_filename=None):
+    '''Render as render does, running the async dryck functions that the page
+    and its templates call concurrently, and return the result. The markup
+    of the calls is only stitched in at the end, so nothing is streamed:
+    the output file, if there is one, is written once it is all done.'''
+    body = await concurrency.gather(render, env, page_filename, template_filename)
+    if body is None:
+        return None
+    env.body = body
+    if out_filename:
+        with output.File(out_filename) as out:
+            out.write(body)
+    return body
@@ -0,0 +1,65 @@
+'''Build a generated site twice in fresh interpreters, first with an empty
+document cache (cold) and then with the documents the first build left (warm).'''
+
+import os
+import subprocess
+import sys
+import tempfile
+
+PAGES = 300
+
+PAGE = '''◊title: Page {n}
+
+# Page {n}
+
+This is a paragraph with *emphasis*, a ◊em{function call} and a [[Link|link]].
+It goes on for a while, ◊strong{◊em{nesting}} things here and there.
+
+* First item
+* Second item with ◊em{markup}
+* Third item
+
+''' + 'Another paragraph of plain text, which goes on and on and on.\n\n' * 20
+
+CHILD = '''
+import pathlib
+import sys
+import time
+
+import appeldryck
+from appeldryck import evaluator
+
+
+class Context(appeldryck.HtmlContext):
+    def wiki_link(self, dest, label):
+        return f'<a href="{dest}">{label}</a>'
+
+
+parse = render = 0
+for path in sorted(pathlib.Path(sys.argv[1]).glob('*.dryck')):
+    text = path.read_text()
+    start = time.perf_counter()
+    doc = evaluator.parse_page(text, persist=True)
+    parsed = time.perf_counter()
+    evaluator.eval_doc(doc, Context(), name=path)
+    parse += parsed - start
+    render += time.perf_counter() - parsed
+print(f'parse {parse * 1000:7.1f} ms, render {render * 1000:7.1f} ms, '
+      f'{evaluator.document_cache.hits} cached documents')
+'''
+
+
+def main():
+    with tempfile.TemporaryDirectory() as site, tempfile.TemporaryDirectory() as cache:
+        for n in range(PAGES):
+            with open(os.path.join(site, f'page{n}.dryck'), 'w') as f:
+                f.write(PAGE.replace('{n}', str(n)))
+        env = dict(os.environ, DRYCK_CACHE_DIR=cache)
+        for run in ('cold', 'warm'):
+            out = subprocess.run([sys.executable, '-c', CHILD, site], env=env,
+                                 check=True, capture_output=True, text=True).stdout
+            print(f'{run}: {out.strip()}')
+
+
+if __name__ == '__main__':
+    main()
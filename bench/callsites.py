@@ -0,0 +1,69 @@
+'''Render a page of 1,000 function calls and variables 50 times over,
+interpreted and compiled, on a plain context and on one overlaid on others,
+which finds most of its functions by delegating to its parents. The page is
+small enough to be compiled, as a big one never is.'''
+
+import time
+
+import appeldryck
+from appeldryck import compiler
+from appeldryck import evaluator
+
+LINE = 'Call ◊today, ◊title, ◊code{x = 1}, ◊signature and ◊(today).\n\n'
+LINES = 200
+RENDERS = 50
+RUNS = 5
+
+
+class Base(appeldryck.HtmlContext):
+    def __init__(self):
+        self.title = 'A title'
+
+    def today(self):
+        return 'Tuesday'
+
+    def signature(self):
+        return '-- me'
+
+    @appeldryck.raw
+    def code(self, text):
+        return f'<code>{text}</code>'
+
+
+class Overlay(appeldryck.HtmlContext):
+    '''Looks up what it doesn’t have itself on its parent.'''
+
+    def __init__(self, parent):
+        self.parent = parent
+
+    def __getattr__(self, name):
+        return getattr(self.parent, name)
+
+
+def main():
+    text = LINE * LINES
+    calls = text.count('◊') * RENDERS
+    doc = evaluator.parse_page(text)
+    assert doc.end - doc.start <= compiler.MAX_LENGTH
+    outputs = []
+    for (name, make) in [('plain', Base),
+                         ('overlaid', lambda: Overlay(Overlay(Overlay(Base()))))]:
+        for (mode, threshold) in [('interpreted', float('inf')), ('compiled', 0)]:
+            compiler.THRESHOLD = threshold
+            doc.compiled = 0
+            ctx = make()
+            outputs.append(evaluator.eval_doc(doc, ctx))
+            assert callable(doc.compiled) == (mode == 'compiled')
+            best = float('inf')
+            for _ in range(RUNS):
+                start = time.perf_counter()
+                for _ in range(RENDERS):
+                    evaluator.eval_doc(doc, ctx)
+                best = min(best, time.perf_counter() - start)
+            print(f'{name:8} {mode:11}: {best * 1000:7.1f} ms, '
+                  f'{best / calls * 1e9:5.0f} ns per call')
+    assert all(out == outputs[0] for out in outputs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+'''Render a template and a partial over and over, interpreted and compiled,
+checking first that the two come out the same.'''
+
+import time
+
+import appeldryck
+from appeldryck import compiler
+from appeldryck import evaluator
+
+TEMPLATE = '''<!DOCTYPE html>
+<html>
+  <head>
+    <title>◊title</title>
+    <link rel="stylesheet" href="/style.css">
+  </head>
+  <body>
+    <nav>◊nav</nav>
+    <main>
+      ◊body
+    </main>
+    <aside>◊sidebar{◊title}{◊author}</aside>
+    <footer>◊footer</footer>
+  </body>
+</html>
+'''
+
+PARTIAL = '''# ◊title
+
+A paragraph by ◊author with *emphasis*, a ◊link{/somewhere}{link}
+and a [[Wiki Page|wiki link]]. It goes on for a line or two,\\
+with a hard break and ◊strong{strong ◊em{nested} text}.
+
+* First item, with ◊em{markup}
+* Second item
+* Third item with a ◊link{/x}{link}
+
+Another paragraph, ◊box{with a block argument}, and more text after it.
+'''
+
+RENDERS = 5000
+RUNS = 3
+
+
+class Context(appeldryck.HtmlContext):
+    def __init__(self):
+        self.title = 'A page'
+        self.author = 'Somebody'
+        self.nav = '<a href="/">Home</a>'
+        self.footer = 'The end'
+        self.body = ''
+
+    def link(self, target, body):
+        return f'<a href="{target}">{body}</a>'
+
+    def wiki_link(self, dest, label):
+        return f'<a href="/wiki/{dest}">{label}</a>'
+
+    def sidebar(self, title, author):
+        return f'<h2>{title}</h2><p>{author}</p>'
+
+    @appeldryck.block
+    def box(self, body):
+        return f'<div class="box">{body}</div>'
+
+
+def render_all():
+    ctx = Context()
+    out = []
+    for _ in range(RENDERS):
+        ctx.body = evaluator.eval_page(PARTIAL, ctx)
+        out.append(evaluator.eval_page(TEMPLATE, ctx, raw=True))
+    return out
+
+
+def measure():
+    best = float('inf')
+    for _ in range(RUNS):
+        # Start afresh, so that every run compiles what it needs.
+        evaluator.parse_cache.clear()
+        start = time.perf_counter()
+        out = render_all()
+        best = min(best, time.perf_counter() - start)
+    return (best, out)
+
+
+def main():
+    results = {}
+    for (name, threshold) in [('interpreted', float('inf')),
+                              ('compiled', compiler.THRESHOLD)]:
+        compiler.THRESHOLD = threshold
+        (elapsed, out) = measure()
+        results[name] = out
+        print(f'{name:11}: {elapsed * 1000:7.1f} ms, '
+              f'{elapsed / RENDERS * 1e6:6.1f} µs per page')
+    assert results['interpreted'] == results['compiled']
+
+    # What compiling costs, once per document.
+    docs = [evaluator.parse_page(PARTIAL), evaluator.parse_page(TEMPLATE, raw=True)]
+    start = time.perf_counter()
+    for doc in docs:
+        compiler.compile_doc(doc)
+    print(f'compiling both: {(time.perf_counter() - start) * 1e6:.0f} µs')
+
+
+if __name__ == '__main__':
+    main()
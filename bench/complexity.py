@@ -0,0 +1,114 @@
+'''Feed the lexers and the parser pathological texts of growing size, and fail
+if the time taken grows faster than the size. Each text comes in four sizes,
+doubling each time, and the slope of log time against log size should stay
+near 1. A rule that rescans the rest of the text, or of the line, from every
+position where it might match shows up here as a slope near 2.'''
+
+import gc
+import math
+import sys
+import time
+
+from appeldryck.parser import fastlex
+from appeldryck.parser import lex
+from appeldryck.parser import session
+
+# The largest slope we put up with. Timings are noisy, but quadratic
+# time comes out near 2, and small texts carry some fixed costs,
+# which flatten the slope rather than steepen it.
+LIMIT = 1.5
+RUNS = 3
+
+# A name, a function making a text of size n, and the smallest n.
+CASES = [
+    ('unclosed links', lambda n: 'a [[ b ' * n, 2000),
+    ('unclosed links, lines', lambda n: '[[ a ]\n' * n, 2000),
+    ('links', lambda n: '[[a|b]] ' * n, 2000),
+    ('link with pipes', lambda n: '[[' + '|' * n + ']]', 12500),
+    ('link with brackets', lambda n: '[[' + ']' * n, 12500),
+    ('brackets', lambda n: '[' * n, 12500),
+    ('unclosed calls', lambda n: '◊(' * n, 2000),
+    ('calls', lambda n: '◊(f){a}' * n, 2000),
+    ('nested braces', lambda n: '◊f{' * n + 'x' + '}' * n, 500),
+    ('unclosed braces', lambda n: '◊f{' * n, 500),
+    ('stars', lambda n: '*' * n, 12500),
+    ('emphasis', lambda n: 'a *b* ' * n, 2000),
+    ('long line', lambda n: 'word ' * n, 12500),
+    ('metatags', lambda n: '◊a: b\n' * n, 2000),
+    ('bare metatags', lambda n: '◊a\n' * n, 2000),
+]
+
+
+def ply_lexer(text):
+    lexer = lex.lexer.clone()
+    lex.start(lexer, text)
+    while lexer.token():
+        pass
+
+def fast_lexer(text):
+    fastlex.TokenStream().start(text)
+
+def parse(text):
+    with session.acquire() as s:
+        s.parse(text)
+
+def parse_raw(text):
+    with session.acquire() as s:
+        s.parse(text, raw=True)
+
+STAGES = [('PLY lexer', ply_lexer), ('fastlex', fast_lexer),
+          ('parse', parse), ('raw parse', parse_raw)]
+
+
+def measure(fn, text):
+    best = float('inf')
+    for _ in range(RUNS):
+        gc.collect()
+        start = time.perf_counter()
+        try:
+            fn(text)
+        except Exception:
+            # Plenty of these texts don’t parse, and failing should be quick too.
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def slope(sizes, times):
+    '''The least squares slope of log time against log size.'''
+    xs = [math.log(n) for n in sizes]
+    ys = [math.log(t) for t in times]
+    (mx, my) = (sum(xs) / len(xs), sum(ys) / len(ys))
+    return (sum((x - mx) * (y - my) for (x, y) in zip(xs, ys))
+            / sum((x - mx) ** 2 for x in xs))
+
+
+def main():
+    # Nested braces are parsed a level at a time, but evaluating or
+    # locating errors in them recurses.
+    sys.setrecursionlimit(100_000)
+    # Warm up, so that the smallest size doesn’t pay for building the parsers.
+    parse('x')
+    parse_raw('x')
+
+    failures = []
+    for (name, make, n) in CASES:
+        sizes = [n, 2 * n, 4 * n, 8 * n]
+        texts = [make(size) for size in sizes]
+        print(f'{name} ({len(texts[0])} to {len(texts[-1])} chars)')
+        for (stage, fn) in STAGES:
+            times = [measure(fn, text) for text in texts]
+            k = slope(sizes, times)
+            verdict = 'ok' if k <= LIMIT else 'SUPERLINEAR'
+            print(f'  {stage:10}: ' + ' '.join(f'{t * 1000:8.1f}' for t in times)
+                  + f' ms, slope {k:4.2f} {verdict}')
+            if k > LIMIT:
+                failures.append(f'{name}, {stage}')
+
+    if failures:
+        print('Superlinear:', '; '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
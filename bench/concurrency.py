@@ -0,0 +1,59 @@
+'''Render a page that calls a slow function, standing in for a database
+query or a web request, on each of its items: first with a plain function,
+then with an async one under eval_page, which runs each call as it comes,
+and then under eval_page_async, which runs them all at once.'''
+
+import asyncio
+import time
+
+import appeldryck
+from appeldryck import evaluator
+
+CALLS = 50
+LATENCY = 0.02
+
+PAGE = '\n\n'.join([
+    '# Stock levels',
+    *(f'* Item {i}: ◊stock{{{i}}}' for i in range(CALLS)),
+    '◊card{Summary}',
+    'That’s all.',
+]) + '\n'
+
+
+class Plain(appeldryck.HtmlContext):
+    def stock(self, item):
+        time.sleep(LATENCY)
+        return f'<b>{int(item) * 7 % 13}</b> in stock'
+
+    @appeldryck.indented
+    def card(self, title):
+        time.sleep(LATENCY)
+        return f'<div class="card">\n  <h2>{title}</h2>\n  ◊stock{{1}}\n</div>\n'
+
+
+class Async(appeldryck.HtmlContext):
+    async def stock(self, item):
+        await asyncio.sleep(LATENCY)
+        return f'<b>{int(item) * 7 % 13}</b> in stock'
+
+    @appeldryck.indented
+    async def card(self, title):
+        await asyncio.sleep(LATENCY)
+        return f'<div class="card">\n  <h2>{title}</h2>\n  ◊stock{{1}}\n</div>\n'
+
+
+def main():
+    results = []
+    for (name, context, render) in (
+            ('plain', Plain, evaluator.eval_page),
+            ('async, in turn', Async, evaluator.eval_page),
+            ('async, at once', Async, lambda page, env: asyncio.run(evaluator.eval_page_async(page, env)))):
+        start = time.perf_counter()
+        results.append(render(PAGE, context()))
+        elapsed = time.perf_counter() - start
+        print(f'{name:14}: {elapsed * 1000:7.1f} ms for {CALLS + 1} calls of {LATENCY * 1000:.0f} ms')
+    assert results[0] == results[1] == results[2]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+'''Parse a multi-megabyte page’s tokens with PLY’s LRParser
+and with the specialized engine.'''
+
+import time
+
+from appeldryck.parser import ast
+from appeldryck.parser import session
+
+PARAGRAPH = '''# A heading
+
+This is a paragraph with *emphasis*, a ◊em{function call} and a [[Link|link]].
+It goes on for a while, ◊strong{◊em{nesting}} things here and there,\\
+with a hard break and a ◊{1 + 1} or two. [Brackets] are fine too.
+
+* First item
+* Second item with ◊(em){markup}{and a second argument}
+
+'''
+COPIES = 10000
+RUNS = 3
+
+
+def main():
+    text = PARAGRAPH * COPIES
+    megabytes = len(text.encode('utf-8')) / 1e6
+    print(f'{megabytes:.2f} MB')
+    with session.acquire() as s:
+        parsers = [('PLY LRParser', lambda: s.parsers[False].parse(lexer=s.lexer)),
+                   ('engine', lambda: s.engines[False].parse(s.lexer))]
+        expected = None
+        for (name, parse) in parsers:
+            best = float('inf')
+            for _ in range(RUNS):
+                s.lexer.source = ast.Source(text)
+                s.lexer.start(text)
+                start = time.perf_counter()
+                result = parse()
+                best = min(best, time.perf_counter() - start)
+                # Only the one tree is kept, so that the garbage collector
+                # doesn’t charge the later parses for walking the earlier ones.
+                if expected is None:
+                    expected = result
+                assert result == expected
+                del result
+            print(f'{name:12}: {best * 1000:7.1f} ms, {megabytes / best:5.2f} MB/s')
+
+        start = time.perf_counter()
+        s.parse(text)
+        elapsed = time.perf_counter() - start
+        print(f'whole parse, arguments and all: {elapsed * 1000:.1f} ms, {megabytes / elapsed:.2f} MB/s')
+
+
+if __name__ == '__main__':
+    main()
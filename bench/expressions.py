@@ -0,0 +1,45 @@
+'''Render a 10,000 row ◊loop whose body has several ◊{} expressions and an ◊if,
+compiling every expression afresh each time, and with the code cache.'''
+
+import time
+
+import appeldryck
+from appeldryck import compiler
+from appeldryck import evaluator
+
+TEMPLATE = '''<table>
+◊loop{rows}{<tr class="◊{'even' if i % 2 == 0 else 'odd'}"><td>◊{str(i)}</td><td>◊{name}</td><td>◊{name.upper()}</td>◊if{i % 3 == 0}{<td>fizz</td>}</tr>
+}
+</table>
+'''
+ROWS = 10_000
+RUNS = 3
+
+
+def render():
+    ctx = appeldryck.Context()
+    ctx.rows = [{'i': i, 'name': f'row {i}'} for i in range(ROWS)]
+    return evaluator.eval_page(TEMPLATE, ctx, raw=True)
+
+
+def main():
+    outputs = []
+    for (name, threshold) in [('interpreted', float('inf')),
+                              ('compiled', compiler.THRESHOLD)]:
+        compiler.THRESHOLD = threshold
+        for maxsize in (0, 1024):
+            evaluator.code_cache.maxsize = maxsize
+            best = float('inf')
+            for _ in range(RUNS):
+                evaluator.parse_cache.clear()
+                evaluator.code_cache.clear()
+                start = time.perf_counter()
+                outputs.append(render())
+                best = min(best, time.perf_counter() - start)
+            print(f'{name:11}, code cache maxsize {maxsize:4}: {best * 1000:7.1f} ms, '
+                  f'{best / ROWS * 1e6:5.1f} µs per row, {evaluator.code_cache}')
+    assert all(out == outputs[0] for out in outputs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+'''Time importing the module behind the `dryck` entry point in a fresh
+interpreter, and check that no parser is built along the way.'''
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 10
+
+CHILD = '''
+import sys
+import time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+built = [m for m in ('appeldryck.parser.parse', 'appeldryck.parser.rawparse')
+         if m in sys.modules]
+print(elapsed, ','.join(built))
+'''
+
+
+def run(module):
+    out = subprocess.run([sys.executable, '-c', CHILD.format(module=module)], cwd=ROOT,
+                         check=True, capture_output=True, text=True).stdout.split()
+    return float(out[0]), out[1:]
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else 'appeldryck.builder'
+    times = []
+    for i in range(RUNS):
+        (elapsed, built) = run(module)
+        times.append(elapsed)
+    print(f'import {module}: {min(times) * 1000:7.1f} ms')
+    if built:
+        print(f'  parsers built at import: {", ".join(built[0].split(","))}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+'''Time reparsing a 2 MB page after a one-character edit, at the start,
+in the middle and at the end, incrementally and from scratch.'''
+
+import gc
+import time
+
+from appeldryck.parser import session
+from appeldryck.parser import test
+
+PARAGRAPH = '''# A heading
+
+This is a paragraph with *emphasis*, a ◊em{function call} and a [[Link|link]].
+It goes on for a while, ◊strong{◊em{nesting}} things here and there,\\
+with a hard break and a ◊{1 + 1} or two. [Brackets] are fine too.
+
+* First item
+* Second item with ◊(em){markup}{and a second argument}
+
+'''
+COPIES = 6500
+RUNS = 3
+
+
+def main():
+    text = PARAGRAPH * COPIES
+    megabytes = len(text.encode('utf-8')) / 1e6
+    print(f'{megabytes:.2f} MB')
+    with session.acquire() as s:
+        start = time.perf_counter()
+        s.parse(text)
+        print(f'full parse: {(time.perf_counter() - start) * 1000:7.1f} ms')
+
+        for where in (0.0, 0.5, 1.0):
+            # Insert a character into the text of a paragraph.
+            pos = text.find('while', int(where * (len(text) - len(PARAGRAPH))))
+            edited = text[:pos] + 'x' + text[pos:]
+            best = float('inf')
+            for _ in range(RUNS):
+                # Don’t charge the update for freeing the last document,
+                # or for collecting garbage after the parse.
+                updated = None
+                doc = s.parse(text)
+                gc.collect()
+                start = time.perf_counter()
+                updated = s.update(doc, edited)
+                best = min(best, time.perf_counter() - start)
+            print(f'edit at {where:4.0%}: {best * 1000:7.2f} ms')
+            assert test.promised(updated) == test.promised(s.parse(edited))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+'''Render @indented partials nested ever deeper, each wrapping the next in
+a div and a few lines of its own. Partials that return their markup are
+indented once per level they are nested in. Partials that write it, as the
+files a build turns into functions do, are indented once, on the way out.
+
+Then render lines with ever more calls on them, each of which needs the
+indentation of the line so far. That should take time linear in the length.'''
+
+import sys
+import time
+
+import appeldryck
+from appeldryck import evaluator
+from appeldryck import output
+
+DEPTHS = [25, 50, 100, 200, 400, 800]
+LINES = 20
+PARTIAL = '<div class="level">\n' + '  <p>A line of the partial.</p>\n' * LINES + '  ◊inner\n</div>\n'
+RUNS = 3
+CALLS = [5000, 10000, 20000, 40000, 80000]
+
+
+def context(depth, writes):
+    class Context(appeldryck.Context):
+        def __init__(self):
+            self.level = 0
+
+        @appeldryck.indented
+        def returned(self):
+            if self.level == depth:
+                return 'The middle.\n'
+            self.level += 1
+            return evaluator.eval_page(PARTIAL, self, raw=True)
+
+        @appeldryck.indented
+        @appeldryck.writes
+        def written(self, write):
+            if self.level == depth:
+                write('The middle.\n')
+                return
+            self.level += 1
+            evaluator.eval_page(PARTIAL, self, raw=True, out=output.Writer(write))
+
+    Context.inner = Context.written if writes else Context.returned
+    return Context()
+
+
+class Line(appeldryck.Context):
+    variable = 'value'
+
+    def function(self):
+        return 'markup'
+
+
+def nested():
+    # Evaluation recurses a few times per level of nesting.
+    sys.setrecursionlimit(20 * max(DEPTHS) + 1000)
+    for depth in DEPTHS:
+        results = []
+        for writes in (False, True):
+            best = float('inf')
+            for _ in range(RUNS):
+                out = output.Memory()
+                start = time.perf_counter()
+                evaluator.eval_page('◊inner\n', context(depth, writes), raw=True, out=out)
+                best = min(best, time.perf_counter() - start)
+            results.append(out.getvalue())
+            name = 'written' if writes else 'returned'
+            print(f'depth {depth:3} {name:8}: {best * 1000:7.1f} ms, '
+                  f'{best * 1e6 / depth:6.1f} µs/level, {len(results[-1]) / 1e6:5.1f} MB')
+        assert results[0] == results[1]
+
+
+def line():
+    for calls in CALLS:
+        doc = evaluator.parse_page('text ◊variable ◊function ' * (calls // 2), raw=True)
+        best = float('inf')
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            evaluator.eval_doc(doc, Line(), raw=True)
+            best = min(best, time.perf_counter() - start)
+        print(f'{calls:5} calls on a line: {best * 1000:7.1f} ms, {best * 1e6 / calls:5.2f} µs/call')
+
+
+def main():
+    nested()
+    line()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+'''Tokenize a large page with PLY’s lexer and with fastlex,
+checking first that the two produce the same tokens.'''
+
+import time
+
+from appeldryck.parser import fastlex
+from appeldryck.parser import lex
+from appeldryck.parser import session
+from appeldryck.parser import test
+
+HEADER = '◊title: A big page\n◊author: Somebody\n\n'
+
+PARAGRAPH = '''# A heading
+
+This is a paragraph with *emphasis*, a ◊em{function call} and a [[Link|link]].
+It goes on for a while, ◊strong{◊em{nesting}} things here and there,\\
+with a hard break and a ◊{1 + 1} or two. [Brackets] are fine too.
+
+* First item
+* Second item with ◊(em){markup}{and a second argument}
+
+'''
+COPIES = 5000
+RUNS = 5
+
+
+def ply_tokens(text):
+    lexer = lex.lexer.clone()
+    lex.start(lexer, text)
+    while lexer.token():
+        pass
+
+def fast_arrays(text):
+    stream = fastlex.TokenStream()
+    stream.lexdata = text
+    fastlex.tokenize(stream)
+
+def fast_tokens(text):
+    stream = fastlex.TokenStream()
+    stream.start(text)
+    while stream.token():
+        pass
+
+def parse(text):
+    with session.acquire() as s:
+        s.parse(text)
+
+
+def main():
+    text = HEADER + PARAGRAPH * COPIES
+    mismatch = test.difflex(text)
+    assert mismatch is None, f'PLY and fastlex disagree: {mismatch}'
+
+    megabytes = len(text.encode('utf-8')) / 1e6
+    print(f'{megabytes:.2f} MB')
+    for (name, fn) in [('PLY lexer', ply_tokens),
+                       ('fastlex arrays', fast_arrays),
+                       ('fastlex tokens', fast_tokens),
+                       ('parse', parse)]:
+        best = float('inf')
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            fn(text)
+            best = min(best, time.perf_counter() - start)
+        print(f'{name:15}: {best * 1000:7.1f} ms, {megabytes / best:6.1f} MB/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''Render a couple of thousand pages, each with a navigation menu, a tag
+cloud and some citations, first with plain functions and then with the same
+functions under @memoize, and report how often the cache was hit.'''
+
+import time
+
+import appeldryck
+from appeldryck import evaluator
+
+PAGES = 2000
+SECTIONS = 10
+LINKS = 200
+
+PAGE = '''# Page ◊{str(n)}
+
+◊nav
+
+Some text citing ◊cite{knuth1984} and ◊cite{lamport1994}, and more text.
+
+◊tags{python markup publishing}
+'''
+
+
+class Plain(appeldryck.HtmlContext):
+    def nav(self):
+        items = ''.join(f'<li><a href="/{self.section}/{i}.html">{self.escape(f"Page {i} & more")}</a></li>\n'
+                        for i in range(LINKS))
+        return f'<nav class="{self.section}">\n<ul>\n{items}</ul>\n</nav>\n'
+
+    def cite(self, key):
+        (author, year) = (key.rstrip('0123456789'), key[-4:])
+        return f'<cite>{self.escape(author.title())} ({year})</cite>'
+
+    def tags(self, names):
+        return ''.join(f'<a class="tag" href="/tags/{name}.html">{self.escape(name)}</a>\n'
+                       for name in sorted(names.split()))
+
+
+class Memoized(Plain):
+    @appeldryck.memoize('section')
+    def nav(self):
+        return super().nav()
+
+    @appeldryck.memoize
+    def cite(self, key):
+        return super().cite(key)
+
+    @appeldryck.memoize
+    def tags(self, names):
+        return super().tags(names)
+
+
+def render(context):
+    pages = []
+    for n in range(PAGES):
+        env = context()
+        env.n = n
+        env.section = f'section{n % SECTIONS}'
+        pages.append(evaluator.eval_page(PAGE, env))
+    return pages
+
+
+def main():
+    results = []
+    for context in (Plain, Memoized):
+        evaluator.memo_cache.clear()
+        start = time.perf_counter()
+        results.append(render(context))
+        elapsed = time.perf_counter() - start
+        print(f'{context.__name__:8}: {elapsed * 1000:7.1f} ms, {elapsed / PAGES * 1e6:6.1f} µs per page')
+    assert results[0] == results[1]
+    for (name, hits, misses, rate) in evaluator.memo_cache.hit_rates():
+        print(f'  {name}: {hits} hits, {misses} misses, {rate:.1%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+'''Measure how much memory a parsed document holds on to,
+per byte of the source text it was parsed from.'''
+
+import tracemalloc
+
+from appeldryck.parser import session
+
+PARAGRAPH = '''This is a paragraph with *emphasis*, a ◊em{function call} and a [[Link|link]].
+It goes on for a while, ◊strong{◊em{nesting}} things here and there.
+
+* First item
+* Second item with ◊em{markup}
+
+Another paragraph of plain text, which goes on and on and on.
+
+'''
+COPIES = 2000
+
+
+def main():
+    text = PARAGRAPH * COPIES
+    with session.acquire() as s:
+        # Warm up, so that the measurement doesn’t include building the parser.
+        s.parse(PARAGRAPH)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        doc = s.parse(text)
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    source_bytes = len(text.encode('utf-8'))
+    print(f'source: {source_bytes / 1e6:.2f} MB')
+    print(f'AST:    {(after - before) / 1e6:.2f} MB, '
+          f'{(after - before) / source_bytes:.1f} bytes per source byte')
+
+
+if __name__ == '__main__':
+    main()
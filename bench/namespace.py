@@ -0,0 +1,41 @@
+'''Render a page of ◊{} expressions with contexts of more and more methods.
+The time per expression shouldn’t depend on how many methods there are.'''
+
+import time
+
+import appeldryck
+from appeldryck import evaluator
+
+PARAGRAPH = 'Some text ◊{title}, ◊{helper_7()} and ◊{str(len(title))}.\n\n'
+COPIES = 1000
+RUNS = 3
+
+
+def context_class(methods):
+    '''An HtmlContext with the given number of helper methods more.'''
+    def make(i):
+        def helper(self):
+            return f'helper {i}'
+        return helper
+    helpers = {f'helper_{i}': make(i) for i in range(methods)}
+    return type('Context', (appeldryck.HtmlContext,), helpers)
+
+
+def main():
+    text = PARAGRAPH * COPIES
+    expressions = text.count('◊{')
+    for methods in (10, 100, 500):
+        ctx = context_class(methods)()
+        ctx.title = 'A title'
+        doc = evaluator.parse_page(text)
+        best = float('inf')
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            evaluator.eval_doc(doc, ctx)
+            best = min(best, time.perf_counter() - start)
+        print(f'{methods:3} methods: {best * 1000:7.1f} ms, '
+              f'{best / expressions * 1e6:6.1f} µs per ◊{{}}')
+
+
+if __name__ == '__main__':
+    main()
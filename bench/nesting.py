@@ -0,0 +1,35 @@
+'''Render deeply nested function calls, ◊f{◊f{◊f{...}}}, at increasing depth.
+Time per level should stay flat: each level’s text is lexed and parsed once.'''
+
+import sys
+import time
+
+import appeldryck
+from appeldryck import evaluator
+
+DEPTHS = [100, 200, 400, 800, 1600]
+
+
+class Context(appeldryck.HtmlContext):
+    def f(self, body):
+        return f'<span>{body}</span>'
+
+
+def main():
+    # Evaluation recurses once per level of nesting.
+    sys.setrecursionlimit(10 * max(DEPTHS) + 1000)
+    # Warm up, so that the first depth doesn’t pay for building the parsers.
+    evaluator.eval_page('◊f{x}', Context())
+    for depth in DEPTHS:
+        text = 'Some text ◊f{and ' * depth + 'the middle' + ' and more}' * depth
+        start = time.perf_counter()
+        doc = evaluator.parse_page(text)
+        parsed = time.perf_counter()
+        evaluator.eval_doc(doc, Context())
+        done = time.perf_counter()
+        print(f'depth {depth:5}: parse {(parsed - start) * 1e6 / depth:6.1f} µs/level, '
+              f'render {(done - start) * 1e6 / depth:6.1f} µs/level')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+'''Render a page of 100,000 paragraphs and a list of 100,000 items,
+and see how long building the markup takes. Documents this big are
+interpreted: compiling one would take far longer than rendering it.'''
+
+import time
+
+import appeldryck
+from appeldryck import evaluator
+
+PARAGRAPH = 'A paragraph with ◊em{some} *markup* and ◊title in it.\n\n'
+ITEM = '* An item with ◊em{some} *markup* and ◊title in it.\n'
+COUNT = 100_000
+RUNS = 3
+
+
+class Context(appeldryck.HtmlContext):
+    def __init__(self):
+        self.title = 'A title'
+
+
+def main():
+    for (name, text) in [('paragraphs', PARAGRAPH * COUNT), ('items', ITEM * COUNT)]:
+        doc = evaluator.parse_page(text)
+        best = float('inf')
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            out = evaluator.eval_doc(doc, Context())
+            best = min(best, time.perf_counter() - start)
+        print(f'{COUNT} {name:10}: {best * 1000:7.1f} ms, {len(out) / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+'''Parse and render a large HTML template in raw mode,
+with the raw grammar and with fastraw’s fast path.'''
+
+import time
+
+import appeldryck
+from appeldryck import evaluator
+from appeldryck.parser import ast
+from appeldryck.parser import fastraw
+from appeldryck.parser import session
+
+ROW = '''    <tr class="row">
+      <td><a href="/items/◊{str(i)}">◊name</a></td>
+      <td>Some static text, [with brackets] and * stars *, # and hashes.</td>
+      <td><span style="color: red">static</span> <em>more static</em></td>
+    </tr>
+
+'''
+HEAD = '''<!DOCTYPE html>
+<html>
+  <head>
+    <title>◊title</title>
+    <style>
+      body { font-family: sans-serif; }
+      td { padding: 0.5em; }
+    </style>
+  </head>
+  <body>
+    ◊body
+    <table>
+'''
+TAIL = '''    </table>
+  </body>
+</html>
+'''
+ROWS = 20000
+RUNS = 3
+
+
+class Context(appeldryck.HtmlContext):
+    def __init__(self):
+        self.i = 1
+        self.name = 'Name'
+        self.title = 'Title'
+        self.body = '<p>Body</p>'
+
+
+def best(f):
+    elapsed = float('inf')
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = f()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return (elapsed, result)
+
+
+def main():
+    text = HEAD + ROW * ROWS + TAIL
+    megabytes = len(text.encode('utf-8')) / 1e6
+    print(f'{megabytes:.2f} MB, {text.count("◊")} ◊s')
+
+    with session.acquire() as s:
+        def grammar():
+            s.lexer.source = ast.Source(text)
+            s.lexer.args = []
+            s.lexer.start(text)
+            return s.run(raw=True)
+
+        def fast():
+            return fastraw.parse(text, 0, ast.Source(text), {}, [])
+
+        docs = []
+        for (name, parse) in [('raw grammar', grammar), ('fast path', fast)]:
+            (elapsed, doc) = best(parse)
+            docs.append(doc)
+            nodes = sum(1 for _ in ast.walk(doc))
+            print(f'parse, {name:11}: {elapsed * 1000:7.1f} ms, {megabytes / elapsed:6.2f} MB/s, {nodes} nodes')
+
+    outputs = []
+    for (name, doc) in zip(['raw grammar', 'fast path'], docs):
+        (elapsed, body) = best(lambda: evaluator.eval_doc(doc, Context(), raw=True))
+        outputs.append(body)
+        print(f'render, {name:10}: {elapsed * 1000:7.1f} ms')
+    assert outputs[0] == outputs[1]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+'''Parse ever longer single paragraphs and bulleted lists. Linear parsing
+keeps the time per line flat as they grow: up to a 1 MB paragraph and a
+50,000 item list.'''
+
+import time
+
+from appeldryck.parser import session
+
+LINE = 'A line of a *very* long paragraph, with [brackets] and ◊em{calls} in it.\n'
+ITEM = '* An item with ◊em{markup} in it\n'
+
+
+def measure(text):
+    with session.acquire() as s:
+        start = time.perf_counter()
+        s.parse(text)
+        return time.perf_counter() - start
+
+
+def main():
+    print('paragraph')
+    lines = 1_000_000 // len(LINE.encode('utf-8'))
+    for n in (lines // 16, lines // 8, lines // 4, lines // 2, lines):
+        text = LINE * n
+        elapsed = measure(text)
+        print(f'{len(text.encode("utf-8")) / 1e6:5.2f} MB: {elapsed * 1000:8.1f} ms, '
+              f'{elapsed / n * 1e6:6.1f} µs per line')
+    print('list')
+    for n in (3125, 6250, 12500, 25000, 50000):
+        elapsed = measure(ITEM * n)
+        print(f'{n:5} items: {elapsed * 1000:8.1f} ms, {elapsed / n * 1e6:6.1f} µs per item')
+
+
+if __name__ == '__main__':
+    main()
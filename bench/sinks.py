@@ -0,0 +1,67 @@
+'''Render a big page into memory, into a file and into nothing,
+comparing the time and the peak memory each takes. What the null sink
+costs is what evaluating the page costs, without keeping what it makes.'''
+
+import os
+import tempfile
+import time
+import tracemalloc
+
+import appeldryck
+from appeldryck import evaluator
+from appeldryck import output
+
+ENTRY = '''# Release ◊{str(n)}
+
+This release fixes *many* bugs, adds ◊em{several} features and [[Changelog|links]]
+to the places where they are described, ◊strong{at length}.
+
+* First change
+* Second change, with ◊em{markup}
+
+'''
+ENTRIES = 20000
+
+
+class Context(appeldryck.HtmlContext):
+    def __init__(self):
+        self.n = 1
+
+    def wiki_link(self, dest, label):
+        return f'<a href="{dest}">{label}</a>'
+
+
+def memory(doc, tmp):
+    out = output.Memory()
+    evaluator.eval_doc(doc, Context(), out=out)
+    with open(os.path.join(tmp, 'memory.html'), 'w') as f:
+        f.write(out.getvalue())
+
+
+def file(doc, tmp):
+    with output.File(os.path.join(tmp, 'file.html')) as out:
+        evaluator.eval_doc(doc, Context(), out=out)
+
+
+def null(doc, tmp):
+    evaluator.eval_doc(doc, Context(), out=output.Null())
+
+
+def main():
+    doc = evaluator.parse_page(ENTRY * ENTRIES)
+    with tempfile.TemporaryDirectory() as tmp:
+        for render in (memory, file, null):
+            start = time.perf_counter()
+            render(doc, tmp)
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            render(doc, tmp)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'{render.__name__:6}: {elapsed * 1000:7.1f} ms, peak {peak / 1e6:6.1f} MB')
+        with open(os.path.join(tmp, 'memory.html')) as a, open(os.path.join(tmp, 'file.html')) as b:
+            assert a.read() == b.read()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+'''Time how long it takes to build both dryck parsers, with the LR table cache
+empty (cold) and populated (warm). Each run is a fresh interpreter.'''
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 10
+
+CHILD = '''
+import sys
+import time
+from appeldryck.parser import parse, rawparse
+from appeldryck.parser.ply import yacc
+start = time.perf_counter()
+for mod in (parse, rawparse):
+    yacc.yacc(module=mod, cachedir=sys.argv[1])
+print(time.perf_counter() - start)
+'''
+
+
+def run(tables):
+    out = subprocess.run([sys.executable, '-c', CHILD, tables], cwd=ROOT,
+                         check=True, capture_output=True, text=True).stdout
+    return float(out)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        tables = os.path.join(tmp, 'tables')
+        cold = []
+        for i in range(RUNS):
+            shutil.rmtree(tables, ignore_errors=True)
+            cold.append(run(tables))
+        warm = [run(tables) for i in range(RUNS)]
+    print(f'cold: {min(cold) * 1000:7.1f} ms')
+    print(f'warm: {min(warm) * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
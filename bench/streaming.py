@@ -0,0 +1,69 @@
+'''Render a big generated page from a file, whole and streamed,
+comparing the peak memory and the time each takes.'''
+
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+import appeldryck
+from appeldryck import evaluator
+
+ENTRY = '''# Release ◊{str(n)}
+
+This release fixes *many* bugs, adds ◊em{several} features and [[Changelog|links]]
+to the places where they are described, ◊strong{at length}.
+
+* First change
+* Second change, with ◊em{markup}
+
+'''
+ENTRIES = 20000
+
+
+class Context(appeldryck.HtmlContext):
+    def __init__(self):
+        self.n = 1
+
+    def wiki_link(self, dest, label):
+        return f'<a href="{dest}">{label}</a>'
+
+
+def whole(path):
+    with open(path) as f:
+        text = f.read()
+    with open(os.devnull, 'w') as out:
+        out.write(evaluator.eval_doc(evaluator.parse_page(text), Context()))
+
+
+def streamed(path):
+    with open(path) as f, open(os.devnull, 'w') as out:
+        evaluator.stream_page(f, Context(), out)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'changelog.dryck')
+        with open(path, 'w') as f:
+            f.write(ENTRY * ENTRIES)
+        megabytes = os.path.getsize(path) / 1e6
+        print(f'{megabytes:.2f} MB')
+        # Warm up, so that the measurements don’t include building the parser.
+        evaluator.stream_page(io.StringIO(ENTRY), Context(), io.StringIO())
+
+        for render in (whole, streamed):
+            evaluator.parse_cache.clear()
+            start = time.perf_counter()
+            render(path)
+            elapsed = time.perf_counter() - start
+            evaluator.parse_cache.clear()
+            tracemalloc.start()
+            render(path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'{render.__name__:8}: {elapsed * 1000:7.1f} ms, peak {peak / 1e6:6.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
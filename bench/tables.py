@@ -0,0 +1,91 @@
+'''Compare the memory and lookup cost of the LR action table as PLY used to
+keep it, in dicts, as a list of rows, and as the parser now keeps it, in a
+flat array, of which the engine reads a flat list, and from which PLY’s LRParser makes
+dict rows, when it is used, for tracking positions or debugging.'''
+
+import random
+import sys
+import time
+
+from appeldryck.parser import engine
+from appeldryck.parser.ply import yacc
+
+LOOKUPS = 1_000_000
+
+
+def size(obj):
+    '''The size of a table, not counting the ints and strs in it,
+    which are cached or shared with the grammar.'''
+    total = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        total += sum(size(value) for value in obj.values())
+    elif isinstance(obj, list):
+        total += sum(size(item) for item in obj)
+    elif isinstance(obj, (int, str)):
+        return 0
+    return total
+
+
+def main():
+    # Catch the dict tables on their way into the parser.
+    read = yacc.read_tables
+    dicts = []
+    yacc.read_tables = lambda filename: dicts.append(read(filename)) or dicts[-1]
+    from appeldryck.parser.parse import parser
+    yacc.read_tables = read
+    if not dicts or dicts[0] is None:
+        sys.exit('Run this again, now that the tables have been cached.')
+    (action, goto) = (dicts[0].lr_action, dicts[0].lr_goto)
+
+    tables = parser.tables
+    width = tables.width
+    names = {code: name for (name, code) in tables.codes.items()}
+    rows = [[action[state].get(names[code]) for code in range(len(names))]
+            for state in range(len(action))]
+
+    print('action and goto tables:')
+    print(f'  PLY dicts:    {size(action) + size(goto):7} bytes')
+    print(f'  lists of rows {size(rows) * 2:7} bytes (the goto table about the same)')
+    print(f'  flat arrays:  {sys.getsizeof(tables.action) + sys.getsizeof(tables.goto):7} bytes')
+    for state in range(tables.states):
+        (parser.action[state], parser.goto[state])
+    print(f'  and, once LRParser has used every state, rows of them: '
+          f'{size(dict(parser.action)) + size(dict(parser.goto))} bytes')
+
+    rnd = random.Random(0)
+    pairs = [(state, code) for state in range(len(action)) for code in range(engine.END + 1)]
+    lookups = [rnd.choice(pairs) for _ in range(LOOKUPS)]
+    by_name = [(state, names[code]) for (state, code) in lookups]
+    by_offset = [(state * width, code) for (state, code) in lookups]
+
+    def ply_dicts():
+        for (state, name) in by_name:
+            action[state].get(name)
+
+    def lists():
+        for (state, code) in lookups:
+            rows[state][code]
+
+    def flat():
+        table = engine.specialize(parser).action
+        for (offset, code) in by_offset:
+            table[offset + code]
+
+    def ply_rows():
+        table = parser.action
+        for (state, name) in by_name:
+            table[state].get(name)
+
+    print(f'{LOOKUPS} action lookups:')
+    for (name, fn) in [('PLY dicts', ply_dicts), ('lists of rows', lists),
+                       ('engine, flat', flat), ('PLY, rows', ply_rows)]:
+        best = float('inf')
+        for _ in range(5):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        print(f'  {name:14}: {best * 1e9 / LOOKUPS:5.1f} ns per lookup')
+
+
+if __name__ == '__main__':
+    main()
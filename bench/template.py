@@ -0,0 +1,49 @@
+'''Render a site of many small pages, each through the same .html.dryck
+template, with and without the parse cache.'''
+
+import time
+
+import appeldryck
+from appeldryck import evaluator
+
+PAGES = 5000
+
+TEMPLATE = '''<!DOCTYPE html>
+<html>
+  <head>
+    <title>◊title</title>
+  </head>
+  <body>
+    <nav>◊{nav()}</nav>
+    ◊body
+    ◊if{n % 2 == 0}{<footer>Even page ◊{str(n)}</footer>}
+  </body>
+</html>
+'''
+
+
+class Context(appeldryck.HtmlContext):
+    def nav(self):
+        return '<a href="/">Home</a>'
+
+
+def render_site():
+    for n in range(PAGES):
+        ctx = Context()
+        ctx.n = n
+        ctx.body = evaluator.eval_page(f'◊title: Page {n}\n\nThis is *page* {n}.\n', ctx)
+        evaluator.eval_page(TEMPLATE, ctx, raw=True)
+
+
+def main():
+    for maxsize in (0, 256):
+        evaluator.parse_cache.clear()
+        evaluator.parse_cache.maxsize = maxsize
+        start = time.perf_counter()
+        render_site()
+        elapsed = time.perf_counter() - start
+        print(f'maxsize {maxsize:3}: {elapsed * 1000:7.1f} ms, {evaluator.parse_cache}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+'''Render many pages sequentially and on a thread pool, each page in its own
+context, and check that both produce the same output. The dryck function
+sleeps to stand in for blocking I/O.'''
+
+import concurrent.futures
+import sys
+import time
+
+import appeldryck
+from appeldryck import evaluator
+
+PAGES = 200
+WORKERS = 8
+LATENCY = 0.005
+
+PAGE = '''◊title: Page ◊n
+
+# Page ◊{str(n)}
+
+Some *text* with ◊fetch{a ◊em{nested} argument} in it,
+and a second line.
+
+* one ◊fetch{item}
+* two [[Link|label]]
+'''
+
+
+class Context(appeldryck.HtmlContext):
+    def __init__(self, n):
+        self.n = n
+
+    def fetch(self, key):
+        time.sleep(LATENCY)
+        return f'{key}@{self.n}'
+
+    def wiki_link(self, dest, label):
+        return f'<a href="{dest}">{label}</a>'
+
+
+def render(n):
+    return evaluator.eval_page(PAGE.replace('◊n', str(n)), Context(n))
+
+
+def main():
+    start = time.perf_counter()
+    sequential = [render(n) for n in range(PAGES)]
+    sequential_time = time.perf_counter() - start
+
+    # Switch threads aggressively, so that any state shared between
+    # concurrent parses gets trampled on.
+    sys.setswitchinterval(1e-6)
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(WORKERS) as pool:
+        threaded = list(pool.map(render, range(PAGES)))
+    threaded_time = time.perf_counter() - start
+
+    assert threaded == sequential, 'threaded output differs from sequential output'
+    print(f'sequential:        {sequential_time * 1000:7.1f} ms')
+    print(f'{WORKERS} threads:         {threaded_time * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
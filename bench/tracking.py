@@ -0,0 +1,43 @@
+'''Parse the test corpus with and without PLY’s position tracking,
+and time how long it takes to locate an error after the fact.'''
+
+from pathlib import Path
+import time
+
+import appeldryck
+from appeldryck import evaluator
+from appeldryck.parser import session
+
+CORPUS = Path(__file__).parent.parent / 'tests'
+COPIES = 200
+RUNS = 5
+
+
+def main():
+    texts = [path.read_text() for path in sorted(CORPUS.glob('*.dryck'))] * COPIES
+    megabytes = sum(len(text.encode('utf-8')) for text in texts) / 1e6
+    print(f'{len(texts)} documents, {megabytes:.2f} MB')
+    with session.acquire() as s:
+        for tracking in (True, False):
+            best = float('inf')
+            for _ in range(RUNS):
+                start = time.perf_counter()
+                for text in texts:
+                    s.parse(text, tracking=tracking)
+                best = min(best, time.perf_counter() - start)
+            print(f'tracking={tracking!s:5}: {best * 1000:7.1f} ms, {megabytes / best:5.2f} MB/s')
+
+    # The corpus calls functions a bare context doesn’t have, so rendering
+    # it fails, and the error has to be located. The parse itself is cached.
+    start = time.perf_counter()
+    for text in texts:
+        try:
+            evaluator.eval_page(text, appeldryck.HtmlContext(), name='page')
+        except evaluator.DryckException:
+            pass
+    elapsed = time.perf_counter() - start
+    print(f'locating an error: {elapsed / len(texts) * 1e6:.0f} µs per document')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+'''Check that a build writes each page to its file, and leaves nothing
+behind for a page or template that suppresses itself.'''
+
+from pathlib import Path
+
+import pytest
+
+import appeldryck
+
+# The builder overlays contexts, for subdirectories, with overlay.
+pytest.importorskip('overlay')
+from appeldryck import builder
+
+
+def build(tmp_path, monkeypatch, files):
+    '''Build the dryck files in a site in tmp_path, with _page.html.dryck
+    as the template, and return what is in dist.'''
+    monkeypatch.chdir(tmp_path)
+    site = Path(builder.SRC)
+    site.mkdir()
+    Path(builder.DEST).mkdir()
+    for (name, text) in files.items():
+        (site / name).write_text(text)
+
+    ctx = appeldryck.HtmlContext()
+    ctx.template = 'page.html'
+    builder.add_file_to_context(site / '_page.html.dryck', ctx, raw=True)
+    for name in sorted(files):
+        src = site / name
+        if name.startswith('_'):
+            continue
+        if len(src.suffixes) == 1:
+            builder.process(src, ctx)
+        else:
+            builder.preprocess(src, ctx)
+    return {path.name: path.read_text() for path in Path(builder.DEST).iterdir()}
+
+
+def test_process(tmp_path, monkeypatch):
+    files = {'_page.html.dryck': '<body>\n  ◊body\n</body>\n',
+             'kept.dryck': 'Kept.\n\nTwice.\n',
+             'suppressed.dryck': 'Gone. ◊suppress\n',
+             'raw.txt.dryck': 'Raw ◊template.\n',
+             'suppressed.txt.dryck': 'Gone ◊suppress\n'}
+    # The template is @indented, as every file is, so its last newline goes.
+    assert build(tmp_path, monkeypatch, files) == {
+        'kept.html': '<body>\n  <p>Kept.</p>\n  <p>Twice.</p>\n</body>',
+        'raw.txt': 'Raw page.html.\n'}
+
+
+def test_template_suppressed(tmp_path, monkeypatch):
+    files = {'_page.html.dryck': '<body>◊suppress</body>\n',
+             'page.dryck': 'A page.\n'}
+    assert build(tmp_path, monkeypatch, files) == {}
@@ -0,0 +1,51 @@
+'''Check that a compiled document renders as it does interpreted.'''
+
+import appeldryck
+from appeldryck import compiler
+from appeldryck import evaluator
+
+RENDERS = compiler.THRESHOLD + 5
+
+
+class Counter(appeldryck.HtmlContext):
+    '''A context whose variable is a property, which changes every time it
+    is read, without the context ever being set.'''
+
+    def __init__(self):
+        self.visits = 0
+
+    @property
+    def visit(self):
+        self.__dict__['visits'] += 1
+        return str(self.visits)
+
+
+class Lookup(appeldryck.HtmlContext):
+    '''A context that finds its variables in a dict, with __getattr__.'''
+
+    def __init__(self, values):
+        self.values = values
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['values'][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def test_property_variable():
+    page = 'Visit ◊visit.\n'
+    env = Counter()
+    for i in range(1, RENDERS + 1):
+        assert evaluator.eval_page(page, env) == f'<p>Visit {i}.</p>\n'
+    assert callable(evaluator.parse_page(page).compiled)
+
+
+def test_getattr_variable():
+    page = 'Hi ◊name.\n'
+    values = {}
+    env = Lookup(values)
+    for i in range(RENDERS):
+        values['name'] = str(i)
+        assert evaluator.eval_page(page, env) == f'<p>Hi {i}.</p>\n'
+    assert callable(evaluator.parse_page(page).compiled)
@@ -0,0 +1,121 @@
+'''Check that a page with async calls renders as it does when they are sync,
+and fails the same way.'''
+
+import asyncio
+
+import pytest
+
+import appeldryck
+from appeldryck import evaluator
+
+# The names that memo has been called with.
+memo_calls = []
+
+
+def make(is_async):
+    '''A context whose fetch and fail are async, or not.'''
+
+    class Context(appeldryck.HtmlContext):
+        def __init__(self):
+            self.items = [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}]
+
+        if is_async:
+            async def fetch(self, x):
+                await asyncio.sleep(0.001)
+                return x.upper()
+
+            async def fail(self, x):
+                await asyncio.sleep(0.001)
+                raise ValueError(x)
+        else:
+            def fetch(self, x):
+                return x.upper()
+
+            def fail(self, x):
+                raise ValueError(x)
+
+        def tagged(self, x):
+            return f'[{self.name}:{x}]'
+
+        def upper(self, x):
+            return x.upper()
+
+        def length(self, x):
+            return str(len(x))
+
+        def boom(self, x):
+            raise KeyError(x)
+
+        @appeldryck.memoize('name')
+        def memo(self, x):
+            memo_calls.append(self.name)
+            return f'<{self.name}:{x}>'
+
+        @appeldryck.indented
+        def block(self, x):
+            return f'<div>\n  {x}\n</div>\n'
+
+    return Context
+
+
+Sync = make(False)
+Async = make(True)
+
+
+def render(env, page, raw=False):
+    evaluator.memo_cache.clear()
+    return asyncio.run(evaluator.eval_page_async(page, env, raw=raw, name='page'))
+
+
+def same(page, raw=False):
+    expected = evaluator.eval_page(page, Sync(), raw=raw, name='page')
+    # Enough times over for the page to be compiled, too.
+    for _ in range(12):
+        assert render(Async(), page, raw) == expected
+    return expected
+
+
+def test_arguments():
+    assert same('◊upper{◊fetch{x}} ◊length{◊fetch{x}}\n') == '<p>X 1</p>\n'
+
+
+def test_blocks():
+    same('# Head ◊fetch{h}\n\n*em ◊fetch{e}*\n\n* ◊upper{◊fetch{i}}\n* two\n')
+
+
+def test_indented():
+    same('<main>\n  ◊block{◊upper{◊block{◊fetch{x}}}}\n</main>\n', raw=True)
+
+
+def test_loop():
+    page = 'Tags: ◊loop{items}{◊tagged{◊fetch{x}} }\n'
+    assert same(page) == '<p>Tags: [a:X] [b:X] [c:X] </p>\n'
+
+
+def test_memoize():
+    page = '◊loop{items}{◊memo{◊fetch{x}} ◊memo{◊fetch{x}} }\n'
+    assert same(page) == '<p><a:X> <a:X> <b:X> <b:X> <c:X> <c:X> </p>\n'
+    # Called once an item, and then found in the cache.
+    memo_calls.clear()
+    render(Async(), page)
+    assert memo_calls == ['a', 'b', 'c']
+
+
+def error(env, page):
+    with pytest.raises(evaluator.DryckException) as info:
+        if isinstance(env, Async):
+            render(env, page)
+        else:
+            evaluator.eval_page(page, env, name='page')
+    return str(info.value)
+
+
+@pytest.mark.parametrize('page', [
+    'One\n\nTwo\n\nThree ◊fail{x}\n',
+    'One\n\nTwo\n\nThree ◊boom{◊fetch{x}}\n',
+    'One\n\n◊loop{items}{◊boom{◊fetch{◊name}}}\n',
+])
+def test_errors(page):
+    where = error(Sync(), page)
+    assert 'line' in where
+    assert error(Async(), page) == where
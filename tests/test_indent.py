@@ -0,0 +1,102 @@
+'''Check that Line follows indentation as get_indent finds it, that an Indenter
+indents as @indented functions always have, and that partials nested deep
+come out the same whether they return their markup or write it.'''
+
+import random
+
+import pytest
+
+import appeldryck
+from appeldryck import evaluator
+from appeldryck import output
+
+PIECES = ['', ' ', '   ', 'a', 'two words', '  indented', '\n', '\n\n', '\n  ', 'end\n', ' \n ']
+TRIALS = 2000
+
+
+def pieces(rand):
+    return [rand.choice(PIECES) for _ in range(rand.randrange(1, 12))]
+
+
+def indented(markup, pad):
+    '''What an @indented function’s markup becomes, as apply_func made it.'''
+    if markup.endswith('\n'):
+        markup = markup[:-1]
+    return markup.replace('\n', '\n' + pad)
+
+
+def test_line():
+    rand = random.Random(0)
+    for _ in range(TRIALS):
+        (parts, line) = ([], output.Line())
+        for piece in pieces(rand):
+            parts.append(piece)
+            # Asked after some pieces, and not after others.
+            if rand.random() < 0.5:
+                assert line.indent(parts) == evaluator.get_indent(''.join(parts)), parts
+        assert line.indent(parts) == evaluator.get_indent(''.join(parts)), parts
+
+
+@pytest.mark.parametrize('depth', [1, 2, 3])
+def test_indenter(depth):
+    rand = random.Random(depth)
+    for _ in range(TRIALS):
+        written = pieces(rand)
+        indents = [rand.randrange(4) for _ in range(depth)]
+        parts = []
+        write = parts.append
+        for indent in indents:
+            write = output.Indenter(write, indent).write
+        for piece in written:
+            write(piece)
+        expected = ''.join(written)
+        for indent in reversed(indents):
+            expected = indented(expected, ' ' * indent)
+        assert ''.join(parts) == expected, (written, indents)
+
+
+PARTIAL = '<div>\n  <p>A line.</p>\n\n  ◊inner\n</div>\n'
+
+
+def nested(depth, writes):
+    class Context(appeldryck.Context):
+        def __init__(self):
+            self.level = 0
+
+        @appeldryck.indented
+        def returned(self):
+            if self.level == depth:
+                return 'The middle.\n'
+            self.level += 1
+            return evaluator.eval_page(PARTIAL, self, raw=True)
+
+        @appeldryck.indented
+        @appeldryck.writes
+        def written(self, write):
+            if self.level == depth:
+                write('The middle.\n')
+                return
+            self.level += 1
+            evaluator.eval_page(PARTIAL, self, raw=True, out=output.Writer(write))
+
+    Context.inner = Context.written if writes else Context.returned
+    return evaluator.eval_page('<main>\n  ◊inner\n</main>\n', Context(), raw=True)
+
+
+def test_nested():
+    # Blank lines are indented too, as they always were.
+    assert nested(2, False) == '\n'.join([
+        '<main>',
+        '  <div>',
+        '    <p>A line.</p>',
+        '  ',
+        '    <div>',
+        '      <p>A line.</p>',
+        '    ',
+        '      The middle.',
+        '    </div>',
+        '  </div>',
+        '</main>',
+        ''])
+    for depth in (1, 5, 20):
+        assert nested(depth, True) == nested(depth, False)
@@ -0,0 +1,49 @@
+'''Check fastlex against PLY’s lexer, token by token,
+on the test corpus and on generated documents.'''
+
+from pathlib import Path
+
+from appeldryck.parser import fastlex
+from appeldryck.parser import lex
+from appeldryck.parser import test
+
+CORPUS = Path(__file__).parent
+DOCUMENTS = 2000
+
+
+def ply_lexer(text):
+    lexer = lex.lexer.clone()
+    lex.start(lexer, text)
+    while lexer.token():
+        pass
+
+def fast_lexer(text):
+    fastlex.TokenStream().start(text)
+
+def rejects(lexer, text):
+    try:
+        lexer(text)
+    except Exception:
+        return True
+    return False
+
+
+def check(text):
+    try:
+        mismatch = test.difflex(text)
+    except Exception:
+        # Then both lexers should fail on it.
+        if rejects(ply_lexer, text) and rejects(fast_lexer, text):
+            return
+        raise
+    assert mismatch is None, f'PLY and fastlex disagree on {text!r}: {mismatch}'
+
+
+def test_corpus():
+    for path in sorted(CORPUS.glob('*.dryck')):
+        check(path.read_text())
+
+
+def test_generated():
+    for text in test.corpus(DOCUMENTS):
+        check(text)
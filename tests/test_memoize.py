@@ -0,0 +1,139 @@
+'''Check that @memoize functions make the same markup as plain ones, are
+called again only when what they depend on changes, and are counted.'''
+
+import appeldryck
+from appeldryck import cache
+from appeldryck import evaluator
+
+PAGES = 30
+SECTIONS = 3
+
+PAGE = '''# Page ◊{str(n)}
+
+◊nav
+
+Citing ◊cite{knuth1984} and ◊cite{lamport1994}.
+
+◊tags{python markup}
+'''
+
+# The functions that have been called, rather than found in the cache.
+calls = []
+
+
+class Plain(appeldryck.HtmlContext):
+    def nav(self):
+        calls.append('nav')
+        return f'<nav class="{self.section}"></nav>\n'
+
+    def cite(self, key):
+        calls.append('cite')
+        return f'<cite>{key}</cite>'
+
+    def tags(self, names):
+        calls.append('tags')
+        return ' '.join(f'<a>{name}</a>' for name in names.split())
+
+
+class Memoized(Plain):
+    @appeldryck.memoize('section')
+    def nav(self):
+        return super().nav()
+
+    @appeldryck.memoize
+    def cite(self, key):
+        return super().cite(key)
+
+    @appeldryck.memoize
+    def tags(self, names):
+        return super().tags(names)
+
+
+def render(context):
+    evaluator.memo_cache.clear()
+    calls.clear()
+    pages = []
+    for n in range(PAGES):
+        env = context()
+        env.n = n
+        env.section = f'section{n % SECTIONS}'
+        pages.append(evaluator.eval_page(PAGE, env))
+    return pages
+
+
+def test_same_markup():
+    assert render(Memoized) == render(Plain)
+
+
+def test_hit_rates():
+    render(Memoized)
+    # Once for each section, and for each set of arguments.
+    assert sorted(calls) == ['cite'] * 2 + ['nav'] * SECTIONS + ['tags']
+    rates = {name.rsplit('.', 1)[-1]: (hits, misses)
+             for (name, hits, misses, rate) in evaluator.memo_cache.hit_rates()}
+    assert rates == {'nav': (PAGES - SECTIONS, SECTIONS),
+                     'cite': (2 * PAGES - 2, 2),
+                     'tags': (PAGES - 1, 1)}
+    # The most called first.
+    assert evaluator.memo_cache.hit_rates()[0][0].endswith('.cite')
+
+
+class Block(appeldryck.Context):
+    def __init__(self):
+        self.items = ['x']
+
+    @appeldryck.memoize
+    @appeldryck.indented
+    def block(self):
+        calls.append('block')
+        return '<div>\n  inner\n</div>\n'
+
+    @appeldryck.memoize('items')
+    def count(self):
+        calls.append('count')
+        return str(len(self.items))
+
+
+def test_indented():
+    # What is cached is the markup before it is indented.
+    evaluator.memo_cache.clear()
+    calls.clear()
+    page = '◊block\n  ◊block\n    ◊block\n'
+    assert evaluator.eval_page(page, Block(), raw=True) == (
+        '<div>\n  inner\n</div>\n'
+        '  <div>\n    inner\n  </div>\n'
+        '    <div>\n      inner\n    </div>\n')
+    assert calls == ['block']
+
+
+def test_keys():
+    (a, b) = (Block(), Block())
+    props = evaluator.get_func_props(a.count)
+    # The same function, looked up on two contexts, is the same function.
+    assert evaluator.memo_key(a.count, [], a, props.memoize) == \
+        evaluator.memo_key(b.count, [], b, props.memoize)
+    # A list can't be hashed, so a call that depends on one isn't cached.
+    assert evaluator.memo_key(a.count, [], a, props.memoize) is None
+    evaluator.memo_cache.clear()
+    calls.clear()
+    for n in range(3):
+        a.items = ['x'] * n
+        assert evaluator.eval_page('◊count', a, raw=True) == str(n)
+    assert calls == ['count'] * 3
+    # A tuple can, and so is cached, until it changes.
+    for items in [('x',), ('x',), ('x', 'y')]:
+        a.items = items
+        evaluator.eval_page('◊count', a, raw=True)
+    assert calls == ['count'] * 5
+
+
+def test_lru():
+    memo = cache.MemoCache(maxsize=2)
+    for key in ('a', 'b'):
+        memo.put(key, key.upper())
+    assert memo.lookup('f', 'a') == 'A'
+    # b is the least recently used, so c pushes it out.
+    memo.put('c', 'C')
+    assert memo.lookup('f', 'b') is None
+    assert (memo.lookup('f', 'a'), memo.lookup('f', 'c')) == ('A', 'C')
+    assert memo.hit_rates() == [('f', 3, 1, 0.75)]
@@ -0,0 +1,85 @@
+'''Check the output sinks, and that a page streamed comes out as it does whole.'''
+
+import pytest
+
+import appeldryck
+from appeldryck import evaluator
+from appeldryck import output
+from appeldryck.parser import test
+
+DOCUMENTS = 500
+
+PAGE = '''◊title: A page
+
+# ◊title
+
+Some *markup*, ◊em{and a call}.
+
+* An item
+* Another
+'''
+
+
+class Context(appeldryck.HtmlContext):
+    def __init__(self):
+        self.x = 'ex'
+        self.author = 'Somebody'
+
+    def f(self, *args):
+        return f'<f>{"|".join(args)}</f>'
+
+    def g(self, *args):
+        return f'<g>{"|".join(args)}</g>'
+
+    def wiki_link(self, dest, label):
+        return f'<a href="/{dest}">{label}</a>'
+
+
+def test_sinks(tmp_path):
+    whole = evaluator.eval_page(PAGE, Context())
+    memory = output.Memory()
+    evaluator.eval_page(PAGE, Context(), out=memory)
+    assert memory.getvalue() == whole
+    null = output.Null()
+    evaluator.eval_page(PAGE, Context(), out=null)
+    assert null.size == len(whole)
+    path = tmp_path / 'page.html'
+    with output.File(path) as out:
+        evaluator.eval_page(PAGE, Context(), out=out)
+    assert path.read_text() == whole
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_file_discarded(tmp_path):
+    path = tmp_path / 'page.html'
+    path.write_text('As it was')
+    with output.File(path) as out:
+        out.write('Half a page')
+        out.discard()
+    with pytest.raises(evaluator.DryckException):
+        with output.File(path) as out:
+            evaluator.eval_page('Half a page ◊nothing\n', Context(), out=out)
+    assert path.read_text() == 'As it was'
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def render(text, stream):
+    '''The markup of text, whole or streamed a line at a time,
+    or None if it fails.'''
+    try:
+        if stream:
+            out = output.Memory()
+            evaluator.stream_page(text.splitlines(keepends=True), Context(), out)
+            return out.getvalue()
+        return evaluator.eval_page(text, Context())
+    except Exception:
+        return None
+
+
+def test_streamed():
+    rendered = 0
+    for text in test.corpus(DOCUMENTS):
+        whole = render(text, False)
+        assert render(text, True) == whole, f'Streaming {text!r} changed its markup'
+        rendered += whole is not None
+    assert rendered > DOCUMENTS // 10
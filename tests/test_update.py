@@ -0,0 +1,47 @@
+'''Check that an edited document updated incrementally comes out as
+it does parsed afresh, over generated documents and random edits.'''
+
+import random
+
+from appeldryck.parser import session
+from appeldryck.parser import test
+
+DOCUMENTS = 1000
+EDITS = 10
+
+
+def parses(text):
+    try:
+        with session.acquire() as s:
+            s.parse(text)
+    except Exception:
+        return False
+    return True
+
+def updates(old, new):
+    try:
+        with session.acquire() as s:
+            s.update(s.parse(old), new)
+    except Exception:
+        return False
+    return True
+
+
+def test_generated():
+    rand = random.Random(0)
+    checked = 0
+    for text in test.corpus(DOCUMENTS):
+        if not parses(text):
+            continue
+        for _ in range(EDITS):
+            edited = test.edit(rand, text)
+            if parses(edited):
+                mismatch = test.diffupdate(text, edited)
+                assert mismatch is None, f'Updating {text!r} to {edited!r} went wrong: {mismatch}'
+                checked += 1
+                # Edits pile up, as they do in an editor.
+                text = edited
+            else:
+                assert not updates(text, edited), f'Updating {text!r} to {edited!r} should fail'
+    # Most generated documents don’t parse, but enough should.
+    assert checked > DOCUMENTS
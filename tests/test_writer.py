@@ -0,0 +1,61 @@
+'''Check that the markup written for a document is the same, byte for byte,
+whether the document is interpreted or compiled, over generated documents.'''
+
+import pytest
+
+import appeldryck
+from appeldryck import compiler
+from appeldryck import evaluator
+from appeldryck.parser import test
+
+DOCUMENTS = 500
+
+
+class Context(appeldryck.HtmlContext):
+    '''A context with everything the generated documents call.'''
+
+    def __init__(self):
+        self.x = 'ex'
+        self.author = 'Somebody'
+
+    def f(self, *args):
+        return f'<f>{"|".join(args)}</f>'
+
+    def g(self, *args):
+        return f'<g>{"|".join(args)}</g>'
+
+    def wiki_link(self, dest, label):
+        return f'<a href="/{dest}">{label}</a>'
+
+
+def render(doc, raw):
+    '''The markup of doc, or the message it fails with.'''
+    try:
+        return evaluator.eval_doc(doc, Context(), raw, name='page')
+    except evaluator.DryckException as e:
+        return f'failed: {e}'
+
+
+def parse(text, raw):
+    try:
+        return evaluator.parse_page(text, raw)
+    except Exception:
+        return None
+
+
+@pytest.mark.parametrize('raw', [False, True])
+def test_generated(raw):
+    (parsed, rendered) = (0, 0)
+    for text in test.corpus(DOCUMENTS):
+        doc = parse(text, raw)
+        if doc is None:
+            continue
+        parsed += 1
+        doc.compiled = 0
+        interpreted = render(doc, raw)
+        doc.compiled = compiler.compile_doc(doc)
+        assert render(doc, raw) == interpreted, f'Compiling {text!r} changed its markup'
+        rendered += not interpreted.startswith('failed: ')
+    # Plenty of them should have rendered, not failed the same way, as
+    # those with a ◊{1 + 1} do, since what it makes isn’t a string.
+    assert rendered > parsed // 3